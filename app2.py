@@ -1,44 +1,22 @@
 import os
 import boto3
 import json
-from PyPDF2 import PdfReader, PdfWriter
+from pdfsplit import split_pdf_by_size, list_parts, load_part_pages
+from part_index import find_relevant_part
 import logging
 
-def split_pdf_by_size(input_pdf_path, output_dir, size_limit_mb=1):
-    os.makedirs(output_dir, exist_ok=True)
-    reader = PdfReader(input_pdf_path)
-    writer = PdfWriter()
-    current_size = 0
-    part_number = 1
-
-    for i, page in enumerate(reader.pages):
-        writer.add_page(page)
-        page_size = len(page.extract_text().encode("utf-8")) / (1024 * 1024)
-        current_size += page_size
-
-        if current_size >= size_limit_mb or i == len(reader.pages) - 1:
-            output_path = os.path.join(output_dir, f"part_{part_number}.pdf")
-            with open(output_path, "wb") as output_file:
-                writer.write(output_file)
-            print(f"Saved: {output_path} (Size: {current_size:.2f} MB)")
-            writer = PdfWriter()
-            current_size = 0
-            part_number += 1
-
-    print(f"PDF split into {part_number - 1} parts and saved in {output_dir}.")
-
 def find_relevant_pdf(question, split_files_dir):
+    # Use the BM25 index built at split time when there is one
+    relevant_pdf = find_relevant_part(question, split_files_dir)
+    if relevant_pdf is not None:
+        print(f"Most relevant PDF part: {relevant_pdf}")
+        return relevant_pdf
+
     max_score = -1
     relevant_pdf = ""
 
-    for file_name in os.listdir(split_files_dir):
-        file_path = os.path.join(split_files_dir, file_name)
-
-        if not file_name.endswith(".pdf"):
-            continue
-
-        reader = PdfReader(file_path)
-        content = " ".join([page.extract_text() for page in reader.pages])
+    for file_path in list_parts(split_files_dir):
+        content = " ".join([page.extract_text() for page in load_part_pages(file_path)])
         score = sum(1 for word in question.split() if word.lower() in content.lower())
         if score > max_score:
             max_score = score
@@ -96,8 +74,7 @@ def generate_answer_with_bedrock(prompt, model_id, region="us-east-1"):
 
 def chatbot_response(question, split_files_dir, model_id, region="us-east-1"):
     relevant_pdf_path = find_relevant_pdf(question, split_files_dir)
-    reader = PdfReader(relevant_pdf_path)
-    pages = [page.extract_text() for page in reader.pages]
+    pages = [page.extract_text() for page in load_part_pages(relevant_pdf_path)]
 
     full_text = " ".join(pages)
     max_context_length = 3000
@@ -1,47 +1,8 @@
 import os
 import boto3
 import json
-from PyPDF2 import PdfReader, PdfWriter
-
-
-def split_pdf_by_size(input_pdf_path, output_dir, size_limit_mb=1):
-    """
-    Splits a PDF file into smaller PDFs, each approximately `size_limit_mb` in size.
-
-    Args:
-        input_pdf_path (str): Path to the input PDF file.
-        output_dir (str): Directory where split PDFs will be saved.
-        size_limit_mb (int): Maximum size of each split PDF in megabytes.
-    """
-    os.makedirs(output_dir, exist_ok=True)
-    reader = PdfReader(input_pdf_path)
-    writer = PdfWriter()
-    current_size = 0
-    part_number = 1
-
-    for page in reader.pages:
-        writer.add_page(page)
-        # Estimate the size of the current PDF part
-        current_size += len(page.extract_text().encode("utf-8")) / (1024 * 1024)  # Convert to MB
-
-        if current_size >= size_limit_mb:
-            # Save the current part
-            output_path = os.path.join(output_dir, f"part_{part_number}.pdf")
-            with open(output_path, "wb") as output_file:
-                writer.write(output_file)
-            print(f"Saved: {output_path}")
-            writer = PdfWriter()  # Reset the writer for the next part
-            current_size = 0
-            part_number += 1
-
-    # Save any remaining pages
-    if len(writer.pages) > 0:
-        output_path = os.path.join(output_dir, f"part_{part_number}.pdf")
-        with open(output_path, "wb") as output_file:
-            writer.write(output_file)
-        print(f"Saved: {output_path}")
-
-    print(f"PDF split into {part_number} parts and saved in {output_dir}.")
+from pdfsplit import split_pdf_by_size, list_parts, load_part_pages
+from part_index import find_relevant_part
 
 
 def find_relevant_pdf(question, split_files_dir):
@@ -55,17 +16,17 @@ def find_relevant_pdf(question, split_files_dir):
     Returns:
         str: Path to the most relevant PDF part.
     """
+    # Use the BM25 index built at split time when there is one
+    relevant_pdf = find_relevant_part(question, split_files_dir)
+    if relevant_pdf is not None:
+        print(f"Most relevant PDF part: {relevant_pdf}")
+        return relevant_pdf
+
     max_score = -1
     relevant_pdf = ""
 
-    for file_name in os.listdir(split_files_dir):
-        file_path = os.path.join(split_files_dir, file_name)
-
-        if not file_name.endswith(".pdf"):
-            continue
-
-        reader = PdfReader(file_path)
-        content = " ".join([page.extract_text() for page in reader.pages])
+    for file_path in list_parts(split_files_dir):
+        content = " ".join([page.extract_text() for page in load_part_pages(file_path)])
 
         # Basic keyword matching for relevance
         score = sum(1 for word in question.split() if word.lower() in content.lower())
@@ -118,8 +79,8 @@ def chatbot_response(question, split_files_dir, model_id, region="us-east-1"):
     relevant_pdf_path = find_relevant_pdf(question, split_files_dir)
 
     # Read the relevant PDF content
-    reader = PdfReader(relevant_pdf_path)
-    content = " ".join([page.extract_text() for page in reader.pages])
+    pages = load_part_pages(relevant_pdf_path)
+    content = " ".join([page.extract_text() for page in pages])
 
     # Create the prompt with context
     prompt = f"Context:\n{content}\n\nQuestion:\n{question}\nAnswer:"
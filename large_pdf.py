@@ -1,55 +1,128 @@
+import os
+import sys
+
+import chromadb
+
+# Shared ingestion helpers live next to the Streamlit apps in s3bot/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "s3bot"))
+from parallel_extract import chunk_pdfs_parallel
+from pipeline import ingest_pdfs_streaming, iter_document_chunks, iter_document_pages
+from chunk_ids import make_chunk_id, new_chunk_indexes
+from dedup import collapse_near_duplicates
+from chunker import CHUNK_OVERLAP, CHUNK_SIZE
+from manifest import EMBEDDED, source_state
+from embeddings import open_collection
+
 CHROMADB_PATH = "./chromadb"
 if not os.path.exists(CHROMADB_PATH):
     os.makedirs(CHROMADB_PATH)
 chroma_client = chromadb.PersistentClient(path=CHROMADB_PATH)
 
-# Get or create collection
-embedding_function = TitanEmbeddingFunction(model_id="amazon.titan-embed-text-v2:0")
-collection = chroma_client.get_or_create_collection(name="my_collection", embedding_function=embedding_function)
+# Get or create collection; EMBEDDING_BACKEND=local builds a new collection with the CPU backend,
+# an existing collection always reopens with the backend it was built with
+collection, embedding_function = open_collection(
+    chroma_client, os.environ.get("CHROMA_COLLECTION", "my_collection"), backend=os.environ.get("EMBEDDING_BACKEND"))
 
 # Efficient PDF Processing
-def process_large_pdf(pdf_path, batch_size=10, chunk_size=800, chunk_overlap=25):
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+def process_large_pdf(pdf_path, batch_size=10, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, parallel=False,
+                      manifest=None):
+    """
+    Chunks and embeds one PDF in batches, with the same chunks as every other ingest path.
+
+    Pages are streamed one at a time, or with parallel=True extracted across a
+    process pool. With an IngestManifest, progress is committed per page after
+    every batch in both modes, and a rerun skips the chunks whose pages are
+    all embedded.
+    """
+    done_pages = set()
+    if manifest is not None:
+        model_id = getattr(embedding_function, "model_id", type(embedding_function).__name__)
+        file_hash, version = source_state(pdf_path, model_id, chunk_size, chunk_overlap)
+        if manifest.is_done(pdf_path, file_hash, version):
+            print(f"Skipping already processed PDF: {pdf_path}")
+            return
+        done_pages = manifest.start_file(pdf_path, file_hash, version)
+        if done_pages:
+            print(f"Resuming {pdf_path}: {len(done_pages)} pages already embedded")
+
+    if parallel:
+        # Pages are extracted across a process pool; chunks come back in page order
+        chunks = chunk_pdfs_parallel([pdf_path], chunk_size, chunk_overlap)
+    else:
+        # Extractors release each page once its text is out, so memory stays bounded
+        chunks = iter_document_chunks(iter_document_pages(pdf_path), chunk_size, chunk_overlap)
+
     batch = []  # Store chunks before adding to ChromaDB
-    
-    with pdfplumber.open(pdf_path) as pdf:
-        for page_num, page in enumerate(pdf.pages):
-            text = page.extract_text()
-            if text:
-                chunks = text_splitter.split_text(text)  # Split text into smaller chunks
-                for chunk in chunks:
-                    batch.append({"text": chunk, "metadata": {"source": pdf_path, "page": page_num + 1}})
-                
-                # Process in batches to avoid memory overflow
-                if len(batch) >= batch_size:
-                    store_embeddings_in_chromadb(batch, embedding_function)
-                    batch = []  # Clear batch from memory
-
-        # Process any remaining chunks
+    marked = max(done_pages, default=0)
+
+    def flush(complete_to):
+        nonlocal marked
         if batch:
             store_embeddings_in_chromadb(batch, embedding_function)
+        batch.clear()  # Clear batch from memory
+        if manifest is not None and complete_to > marked:
+            manifest.mark_pages(pdf_path, range(marked + 1, complete_to + 1), EMBEDDED)
+            marked = complete_to
+
+    last_page = 0
+    for chunk in chunks:
+        metadata = chunk["metadata"]
+        last_page = max(last_page, metadata["page_end"])
+        if set(range(metadata["page_start"], metadata["page_end"] + 1)) <= done_pages:
+            continue
+        # Process in batches to avoid memory overflow. Chunks arrive in page_start
+        # order, so every page before this chunk's first page is fully stored.
+        if len(batch) >= batch_size:
+            flush(metadata["page_start"] - 1)
+        batch.append(chunk)
+
+    # Process any remaining chunks
+    flush(last_page)
+    if manifest is not None:
+        manifest.finish_file(pdf_path)
 
 # Store Embeddings Efficiently in ChromaDB
 def store_embeddings_in_chromadb(batch, embedding_function):
-    documents = [item["text"] for item in batch]
-    metadatas = [item["metadata"] for item in batch]
-    ids = [str(hash(item["text"])) for item in batch]
+    ids = [make_chunk_id(item["metadata"]["source"], item["metadata"]["page"], item["text"]) for item in batch]
+    new_indexes = new_chunk_indexes(collection, ids)
+    if not new_indexes:
+        print(f"Skipping {len(batch)} chunks already in ChromaDB.")
+        return
+
+    documents = [batch[i]["text"] for i in new_indexes]
+    metadatas = [batch[i]["metadata"] for i in new_indexes]
 
     # Store in ChromaDB (Chunked)
-    collection.add(documents=documents, metadatas=metadatas, ids=ids)
-    print(f"✅ Added {len(batch)} chunks to ChromaDB.")
+    collection.add(documents=documents, metadatas=metadatas, ids=[ids[i] for i in new_indexes])
+    print(f"✅ Added {len(new_indexes)} chunks to ChromaDB ({len(batch) - len(new_indexes)} already present).")
 
 # Process All PDFs in a Directory
-def store_all_pdfs_in_chromadb(pdf_dir: str, embedding_function):
+def store_all_pdfs_in_chromadb(pdf_dir: str, embedding_function, parallel=False, streaming=False,
+                               rss_limit_mb=None, manifest=None):
     """Ensure pdf_dir is a string, not a list"""
     if not isinstance(pdf_dir, str):
         raise TypeError(f"Expected pdf_dir to be a string, got {type(pdf_dir)} instead.")
-    
+
+    if streaming:
+        # Extraction, Titan embedding and Chroma writes overlap through bounded queues
+        pdf_paths = [os.path.join(pdf_dir, f) for f in sorted(os.listdir(pdf_dir)) if f.endswith(".pdf")]
+        return ingest_pdfs_streaming(pdf_paths, embedding_function, collection, rss_limit_mb=rss_limit_mb, dedup=True)
+
+    if parallel and manifest is None:
+        # Fan every page of every PDF out across one process pool
+        pdf_paths = [os.path.join(pdf_dir, f) for f in sorted(os.listdir(pdf_dir)) if f.endswith(".pdf")]
+        print(f"Processing {len(pdf_paths)} PDFs in parallel")
+        chunks, _ = collapse_near_duplicates(chunk_pdfs_parallel(pdf_paths))
+        for start in range(0, len(chunks), 10):
+            store_embeddings_in_chromadb(chunks[start:start + 10], embedding_function)
+        return
+
     for pdf_file in os.listdir(pdf_dir):
         if pdf_file.endswith(".pdf"):
             pdf_path = os.path.join(pdf_dir, pdf_file)
             print(f"Processing new PDF: {pdf_file}")
             try:
-                process_large_pdf(pdf_path, batch_size=10)
+                # With a manifest, parallel runs go file by file so each file's progress is committed
+                process_large_pdf(pdf_path, batch_size=10, parallel=parallel, manifest=manifest)
             except Exception as e:
                 print(f"Error processing PDF {pdf_file}: {str(e)}")
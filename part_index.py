@@ -0,0 +1,105 @@
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter
+import json
+import math
+import os
+import re
+
+from pdfsplit import list_parts, load_part_pages
+
+INDEX_NAME = "part_index.json"
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_loaded_indexes = {}
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def part_term_counts(part_path):
+    """Worker: term frequencies of one split part."""
+    text = " ".join(page.extract_text() or "" for page in load_part_pages(part_path))
+    return dict(Counter(tokenize(text)))
+
+
+def build_part_index(split_files_dir, max_workers=None):
+    """
+    Builds the BM25 term index over every part in split_files_dir and saves
+    it as part_index.json next to the parts.
+
+    The parts are read once here, in a process pool, so queries never need to
+    open a PDF again.
+    """
+    part_paths = list_parts(split_files_dir)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        counts = list(executor.map(part_term_counts, part_paths))
+
+    postings = {}
+    for part_id, term_counts in enumerate(counts):
+        for term, tf in term_counts.items():
+            postings.setdefault(term, {})[part_id] = tf
+
+    lengths = [sum(term_counts.values()) for term_counts in counts]
+    index = {
+        "parts": [os.path.basename(path) for path in part_paths],
+        "lengths": lengths,
+        "avg_length": (sum(lengths) / len(lengths)) if lengths else 0,
+        "postings": postings,
+    }
+    with open(os.path.join(split_files_dir, INDEX_NAME), "w") as f:
+        json.dump(index, f)
+    print(f"Indexed {len(part_paths)} parts ({len(postings)} terms) in {split_files_dir}")
+    return index
+
+
+def load_part_index(split_files_dir):
+    """Loads the index once per process and reloads it only when the file changes."""
+    index_path = os.path.join(split_files_dir, INDEX_NAME)
+    if not os.path.exists(index_path):
+        return None
+    mtime = os.path.getmtime(index_path)
+    cached = _loaded_indexes.get(index_path)
+    if cached is None or cached[0] != mtime:
+        with open(index_path) as f:
+            index = json.load(f)
+        # JSON turns the integer part ids into strings
+        index["postings"] = {
+            term: {int(part_id): tf for part_id, tf in part_tfs.items()}
+            for term, part_tfs in index["postings"].items()
+        }
+        cached = (mtime, index)
+        _loaded_indexes[index_path] = cached
+    return cached[1]
+
+
+def score_parts(index, question):
+    """BM25 score of every part containing at least one query term."""
+    part_count = len(index["parts"])
+    avg_length = index["avg_length"] or 1
+    scores = {}
+    for term in set(tokenize(question)):
+        part_tfs = index["postings"].get(term)
+        if not part_tfs:
+            continue
+        idf = math.log(1 + (part_count - len(part_tfs) + 0.5) / (len(part_tfs) + 0.5))
+        for part_id, tf in part_tfs.items():
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * index["lengths"][part_id] / avg_length)
+            scores[part_id] = scores.get(part_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+    return scores
+
+
+def find_relevant_part(question, split_files_dir):
+    """
+    Returns the path of the best-scoring part, or None when there is no index.
+
+    Falls back to the first part when no query term occurs anywhere.
+    """
+    index = load_part_index(split_files_dir)
+    if index is None or not index["parts"]:
+        return None
+    scores = score_parts(index, question)
+    best = max(scores, key=scores.get) if scores else 0
+    return os.path.join(split_files_dir, index["parts"][best])
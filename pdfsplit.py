@@ -1,36 +1,211 @@
 from PyPDF2 import PdfReader, PdfWriter
+from concurrent.futures import ProcessPoolExecutor, wait
+import io
+import json
 import os
 
-def split_pdf_by_size(input_pdf_path, output_dir, size_limit_mb=1):
+MANIFEST_NAME = "manifest.json"
+
+
+def serialized_size(reader, first, last):
+    """
+    Returns the real size in bytes of pages [first, last) written as one PDF,
+    along with the serialized bytes so they can be saved without re-writing.
+    """
+    writer = PdfWriter()
+    for i in range(first, last):
+        writer.add_page(reader.pages[i])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.tell(), buffer.getvalue()
+
+
+def plan_segment(input_pdf_path, first, last, size_limit_bytes):
+    """
+    Worker: packs pages [first, last) into parts no bigger than size_limit_bytes.
+
+    Each part is grown by doubling its page count until the true serialized
+    size exceeds the limit, then binary-searched back to the largest fit, so
+    only O(log pages) serializations are needed per part. A single page that
+    is already over the limit becomes a part of its own.
+
+    Returns:
+        list: (first_page, last_page, size_bytes) per part, with 0-based
+        first_page and exclusive last_page.
+    """
+    reader = PdfReader(input_pdf_path)
+    parts = []
+    start = first
+    while start < last:
+        size, data = serialized_size(reader, start, start + 1)
+        fit_end, fit_size, fit_data = start + 1, size, data
+
+        # Exponential search for an end that no longer fits
+        step = 1
+        bad_end = None
+        while fit_size <= size_limit_bytes and fit_end < last:
+            candidate = min(start + step * 2, last)
+            size, data = serialized_size(reader, start, candidate)
+            if size > size_limit_bytes:
+                bad_end = candidate
+                break
+            fit_end, fit_size, fit_data = candidate, size, data
+            step *= 2
+
+        # Binary search between the last fit and the first miss
+        if bad_end is not None:
+            low, high = fit_end, bad_end
+            while high - low > 1:
+                mid = (low + high) // 2
+                size, data = serialized_size(reader, start, mid)
+                if size <= size_limit_bytes:
+                    low, fit_size, fit_data = mid, size, data
+                else:
+                    high = mid
+            fit_end = low
+
+        parts.append((start, fit_end, fit_size))
+        start = fit_end
+    return parts
+
+
+def merge_segments(input_pdf_path, segments, size_limit_bytes):
+    """
+    Joins the per-segment plans into one, merging the parts that meet at a
+    segment boundary whenever they fit together.
+
+    Within a segment every part is already as large as it can be, so one
+    merge attempt per boundary is enough; a small document packed by many
+    workers ends up as a single part, like a sequential plan would.
+    """
+    reader = PdfReader(input_pdf_path)
+    merged = []
+    for parts in segments:
+        if merged and parts:
+            first, _, _ = merged[-1]
+            _, last, _ = parts[0]
+            size, _ = serialized_size(reader, first, last)
+            if size <= size_limit_bytes:
+                merged[-1] = (first, last, size)
+                parts = parts[1:]
+        merged.extend(parts)
+    return merged
+
+
+def write_parts(input_pdf_path, parts):
+    """Worker: serializes [(first_page, last_page, path), ...] of the input PDF, opening it once."""
+    reader = PdfReader(input_pdf_path)
+    for first, last, path in parts:
+        _, data = serialized_size(reader, first, last)
+        with open(path, "wb") as output_file:
+            output_file.write(data)
+
+
+def load_manifest(split_files_dir):
+    manifest_path = os.path.join(split_files_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def split_pdf_by_size(input_pdf_path, output_dir, size_limit_mb=1, virtual=False, max_workers=None,
+                      build_index=True):
     """
-    Splits a PDF file into smaller PDFs, each approximately size_limit_mb in size.
+    Splits a PDF file into parts whose written size is at most size_limit_mb.
+
+    The document is cut into one segment per worker and each segment is
+    packed in its own process; a merge pass then joins parts across segment
+    boundaries, so the part count does not depend on the number of workers.
+    The final parts are written in parallel under temporary names and only
+    renamed once all of them succeeded. Sizes are measured by actually
+    serializing the candidate part, not estimated from the text.
 
     Args:
         input_pdf_path (str): Path to the input PDF file.
-        output_dir (str): Directory where split PDFs will be saved.
+        output_dir (str): Directory where split PDFs (or the manifest) will be saved.
         size_limit_mb (int): Maximum size of each split PDF in megabytes.
+        virtual (bool): Only write manifest.json with page ranges over the
+            original file instead of copying pages into new PDFs.
+        max_workers (int): Number of worker processes, defaults to the CPU count.
+        build_index (bool): Also build the BM25 part index used by find_relevant_pdf.
+
+    Returns:
+        list: Manifest entries, one per part, in page order.
     """
     os.makedirs(output_dir, exist_ok=True)
-    reader = PdfReader(input_pdf_path)
-    writer = PdfWriter()
-    current_size = 0
-    part_number = 1
-
-    for i, page in enumerate(reader.pages):
-        writer.add_page(page)
-        
-        # Add the estimated size of the current page
-        page_size = len(page.extract_text().encode("utf-8")) / (1024 * 1024)  # Size in MB
-        current_size += page_size
-
-        # If the current size exceeds the limit or it's the last page, save the file
-        if current_size >= size_limit_mb or i == len(reader.pages) - 1:
-            output_path = os.path.join(output_dir, f"part_{part_number}.pdf")
-            with open(output_path, "wb") as output_file:
-                writer.write(output_file)
-            print(f"Saved: {output_path} (Size: {current_size:.2f} MB)")
-            writer = PdfWriter()  # Reset the writer for the next part
-            current_size = 0
-            part_number += 1
-
-    print(f"PDF split into {part_number - 1} parts and saved in {output_dir}.")
+    # Parts from an earlier split would shadow the new manifest entries
+    for stale in os.listdir(output_dir):
+        if stale.startswith("part_") and stale.endswith(".pdf"):
+            os.remove(os.path.join(output_dir, stale))
+    total_pages = len(PdfReader(input_pdf_path).pages)
+    size_limit_bytes = int(size_limit_mb * 1024 * 1024)
+
+    workers = max_workers or os.cpu_count() or 1
+    segment_size = max(1, -(-total_pages // workers))
+    segments = [(first, min(first + segment_size, total_pages)) for first in range(0, total_pages, segment_size)]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(plan_segment, input_pdf_path, first, last, size_limit_bytes)
+                   for first, last in segments]
+        planned = merge_segments(input_pdf_path, [future.result() for future in futures], size_limit_bytes)
+
+        manifest = [{"name": f"part_{part_number}.pdf", "first_page": first + 1, "last_page": last, "bytes": size}
+                    for part_number, (first, last, size) in enumerate(planned, start=1)]
+        if not virtual:
+            temp_paths = [os.path.join(output_dir, f".{part['name']}.tmp") for part in manifest]
+            jobs = [(first, last, temp_path) for (first, last, _), temp_path in zip(planned, temp_paths)]
+            # Contiguous groups, one per worker, so each process parses the input once
+            group_size = max(1, -(-len(jobs) // workers))
+            futures = [executor.submit(write_parts, input_pdf_path, jobs[i:i + group_size])
+                       for i in range(0, len(jobs), group_size)]
+            wait(futures)  # let every writer finish before cleaning up after a failed one
+            try:
+                for future in futures:
+                    future.result()
+            except Exception:
+                for temp_path in temp_paths:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                raise
+            for part, temp_path in zip(manifest, temp_paths):
+                os.replace(temp_path, os.path.join(output_dir, part["name"]))
+                print(f"Saved: {os.path.join(output_dir, part['name'])} (Size: {part['bytes'] / (1024 * 1024):.2f} MB)")
+
+    with open(os.path.join(output_dir, MANIFEST_NAME), "w") as f:
+        json.dump({"source": os.path.abspath(input_pdf_path), "virtual": virtual, "parts": manifest}, f, indent=2)
+
+    print(f"PDF split into {len(manifest)} parts and saved in {output_dir}.")
+
+    if build_index:
+        from part_index import build_part_index
+        build_part_index(output_dir, max_workers)
+    return manifest
+
+
+def list_parts(split_files_dir):
+    """Part paths in page order, whether the split was virtual or written out."""
+    manifest = load_manifest(split_files_dir)
+    if manifest is not None:
+        return [os.path.join(split_files_dir, part["name"]) for part in manifest["parts"]]
+    return [os.path.join(split_files_dir, f) for f in sorted(os.listdir(split_files_dir)) if f.endswith(".pdf")]
+
+
+def load_part_pages(part_path):
+    """
+    Returns the PyPDF2 pages of a part.
+
+    Written parts are opened directly. Virtual parts are resolved through the
+    manifest to a slice of the original file; PyPDF2 only parses those pages
+    when they are accessed.
+    """
+    if os.path.exists(part_path):
+        return PdfReader(part_path).pages
+
+    split_files_dir, name = os.path.split(part_path)
+    manifest = load_manifest(split_files_dir)
+    for part in (manifest or {}).get("parts", []):
+        if part["name"] == name:
+            pages = PdfReader(manifest["source"]).pages
+            return [pages[i] for i in range(part["first_page"] - 1, part["last_page"])]
+    raise FileNotFoundError(f"No split part or manifest entry for {part_path}")
@@ -0,0 +1,245 @@
+import os
+import signal
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from extractors import extract_document
+from pipeline import ingest_pdfs_streaming
+
+try:
+    import docx
+except ImportError:  # python-docx
+    docx = None
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+try:
+    import pptx
+except ImportError:  # python-pptx
+    pptx = None
+
+ATTACHMENT_TIMEOUT = 60  # seconds of extraction per file before it is abandoned
+TIMEOUT_GRACE = 5  # extra seconds the parent waits before killing a worker SIGALRM could not interrupt
+MAX_ATTACHMENT_BYTES = 25 * 1024 * 1024
+MAX_SHEET_ROWS = 5000  # rows read per worksheet; the rest of a huge export is not useful context
+DOCX_PARAGRAPHS_PER_SECTION = 50
+ATTACHMENT_TYPES = (".pdf", ".docx", ".xlsx", ".pptx")
+
+
+class AttachmentTimeout(Exception):
+    pass
+
+
+def extract_docx(path):
+    """Paragraphs and table rows, grouped into sections of DOCX_PARAGRAPHS_PER_SECTION (docx has no pages)."""
+    document = docx.Document(path)
+    blocks = [paragraph.text for paragraph in document.paragraphs if paragraph.text.strip()]
+    for table in document.tables:
+        for row in table.rows:
+            blocks.append(" | ".join(cell.text.strip() for cell in row.cells))
+    return [
+        (section + 1, "\n".join(blocks[start:start + DOCX_PARAGRAPHS_PER_SECTION]))
+        for section, start in enumerate(range(0, len(blocks), DOCX_PARAGRAPHS_PER_SECTION))
+    ]
+
+
+def extract_xlsx(path, max_rows=MAX_SHEET_ROWS):
+    """One page per worksheet: its name followed by up to max_rows rows of cell values."""
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        pages = []
+        for sheet_num, sheet in enumerate(workbook.worksheets, start=1):
+            lines = [f"Sheet: {sheet.title}"]
+            for row in sheet.iter_rows(max_row=max_rows, values_only=True):
+                values = [str(value) for value in row if value is not None]
+                if values:
+                    lines.append(" | ".join(values))
+            pages.append((sheet_num, "\n".join(lines)))
+        return pages
+    finally:
+        workbook.close()
+
+
+def extract_pptx(path):
+    """One page per slide: text frames and table cells."""
+    presentation = pptx.Presentation(path)
+    pages = []
+    for slide_num, slide in enumerate(presentation.slides, start=1):
+        lines = []
+        for shape in slide.shapes:
+            if shape.has_text_frame:
+                lines.append(shape.text_frame.text)
+            if getattr(shape, "has_table", False) and shape.has_table:
+                for row in shape.table.rows:
+                    lines.append(" | ".join(cell.text for cell in row.cells))
+        pages.append((slide_num, "\n".join(line for line in lines if line.strip())))
+    return pages
+
+
+def extract_pdf(path):
+    _, pages = extract_document(path)
+    return pages
+
+
+EXTRACTORS = {
+    ".pdf": ("pdf", extract_pdf, True),
+    ".docx": ("docx", extract_docx, docx is not None),
+    ".xlsx": ("xlsx", extract_xlsx, openpyxl is not None),
+    ".pptx": ("pptx", extract_pptx, pptx is not None),
+}
+
+
+def _raise_timeout(signum, frame):
+    raise AttachmentTimeout()
+
+
+def extract_attachment(path, timeout=ATTACHMENT_TIMEOUT):
+    """
+    Worker: extracts one attachment inside a pool process.
+
+    SIGALRM interrupts the extraction after timeout seconds, so one slow file
+    only costs its own worker that long. It cannot interrupt C code (a
+    parser stuck inside lxml), so the parent enforces the timeout as well.
+
+    Returns:
+        tuple: (extractor name, [(page_number, text), ...])
+    """
+    name, extract, available = EXTRACTORS[os.path.splitext(path)[1].lower()]
+    if not available:
+        raise RuntimeError(f"no {name} extractor installed")
+
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.alarm(timeout)
+    try:
+        return name, [(page, text) for page, text in extract(path) if text]
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _stop_pool(executor):
+    """Shuts a pool down without waiting, killing workers that are stuck."""
+    for process in list((getattr(executor, "_processes", None) or {}).values()):  # no public API before 3.14
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _run_pool(attachments, workers, timeout):
+    """
+    Runs extract_attachment over [(path, jira_key), ...] with at most workers
+    files in flight, yielding (path, jira_key, result or exception).
+
+    A file still running timeout + TIMEOUT_GRACE seconds after it was started
+    is yielded with AttachmentTimeout. Files whose worker died are yielded
+    with BrokenProcessPool. Either way the pool is rebuilt, and the other
+    files that were in flight are run again in the new pool.
+    """
+    pending = deque(attachments)
+    running = {}  # future -> (path, jira_key, deadline)
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                path, jira_key = pending.popleft()
+                future = executor.submit(extract_attachment, path, timeout)
+                running[future] = (path, jira_key, time.monotonic() + timeout + TIMEOUT_GRACE)
+
+            next_deadline = min(deadline for _, _, deadline in running.values())
+            done, _ = wait(running, timeout=max(0, next_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                path, jira_key, _ = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    broken = broken or isinstance(e, BrokenProcessPool)
+                    result = e
+                yield path, jira_key, result
+
+            now = time.monotonic()
+            expired = [future for future, (_, _, deadline) in running.items() if deadline <= now and not future.done()]
+            for future in expired:
+                path, jira_key, _ = running.pop(future)
+                yield path, jira_key, AttachmentTimeout()
+
+            if broken or expired:
+                # Killing the pool takes the other files in flight with it; queue them again
+                pending.extendleft(reversed([(path, jira_key) for path, jira_key, _ in running.values()]))
+                running.clear()
+                _stop_pool(executor)
+                executor = ProcessPoolExecutor(max_workers=workers)
+    finally:
+        _stop_pool(executor)
+
+
+def extract_attachments(attachments, max_workers=None, timeout=ATTACHMENT_TIMEOUT, max_bytes=MAX_ATTACHMENT_BYTES):
+    """
+    Extracts [(path, jira_key), ...] across a process pool.
+
+    Files that are missing, too big, of an unsupported type, time out or fail
+    are reported and skipped. Results are yielded as each file finishes, so a
+    slow spreadsheet never holds back the others. When a worker dies (usually
+    killed for memory), the files it may have been running are extracted
+    again one at a time, so only the file that kills it is lost.
+
+    Yields:
+        tuple: (path, jira_key, extractor name, [(page_number, text), ...])
+    """
+    accepted = []
+    for path, jira_key in attachments:
+        if not path.lower().endswith(ATTACHMENT_TYPES):
+            continue
+        try:
+            size = os.path.getsize(path)
+        except OSError as e:
+            print(f"Skipping {path} ({jira_key}): {str(e)}")
+            continue
+        if size > max_bytes:
+            print(f"Skipping {path} ({jira_key}): {size / 1024 / 1024:.1f} MB is over the attachment size limit")
+            continue
+        accepted.append((path, jira_key))
+
+    if not accepted:
+        return
+    suspects = []
+    for path, jira_key, result in _run_pool(accepted, max_workers or os.cpu_count() or 1, timeout):
+        if isinstance(result, BrokenProcessPool):
+            suspects.append((path, jira_key))
+            continue
+        yield from _extracted(path, jira_key, result, timeout)
+
+    if suspects:
+        print(f"A worker crashed; extracting {len(suspects)} attachments again one at a time")
+        for path, jira_key, result in _run_pool(suspects, 1, timeout):
+            if isinstance(result, BrokenProcessPool):
+                print(f"Worker crashed extracting {path} ({jira_key}); skipping it")
+                continue
+            yield from _extracted(path, jira_key, result, timeout)
+
+
+def _extracted(path, jira_key, result, timeout):
+    """Yields the extraction result of one file, or reports why it failed."""
+    if isinstance(result, AttachmentTimeout):
+        print(f"Timed out extracting {path} ({jira_key}) after {timeout}s")
+    elif isinstance(result, Exception):
+        print(f"Error extracting {path} ({jira_key}): {str(result)}")
+    else:
+        name, pages = result
+        yield path, jira_key, name, pages
+
+
+def iter_attachment_pages(attachments, **options):
+    """Pipeline page tuples for the extracted attachments, tagged with their Jira key."""
+    for path, jira_key, name, pages in extract_attachments(attachments, **options):
+        for page_num, text in pages:
+            yield path, page_num, text, {"jira_key": jira_key, "attachment": os.path.basename(path), "extractor": name}
+
+
+def ingest_attachments(attachments, embedding_function, collection, **options):
+    """Extracts [(path, jira_key), ...] and streams their chunks into collection."""
+    return ingest_pdfs_streaming([], embedding_function, collection, pages=iter_attachment_pages(attachments, **options))
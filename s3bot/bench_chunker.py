@@ -0,0 +1,38 @@
+import statistics
+import sys
+import time
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from chunker import CHARS_PER_TOKEN, TokenChunker, count_tokens
+from page_cache import PageTextCache, extract_pages_cached
+
+PDF_PATH = "./s3-api.pdf"
+
+
+def benchmark_splitter(name, splitter, texts, repeats=3):
+    """Splits every text repeats times and reports throughput and chunk token spread."""
+    total_chars = sum(len(text) for text in texts)
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        chunks = [chunk for text in texts for chunk in splitter.split_text(text)]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tokens = [count_tokens(chunk) for chunk in chunks]
+    print(f"{name:<32} {best:7.3f}s  {total_chars / best / 1e6:7.2f} MB/s  {len(chunks):>7} chunks  "
+          f"tokens mean {statistics.mean(tokens):6.1f}  stdev {statistics.pstdev(tokens):6.1f}  max {max(tokens)}")
+
+
+if __name__ == "__main__":
+    pdf_path = sys.argv[1] if len(sys.argv) > 1 else PDF_PATH
+    pages = [text for _, text in extract_pages_cached(pdf_path, PageTextCache()) if text]
+    document = "\n\n".join(pages)
+    print(f"{pdf_path}: {len(pages)} pages, {len(document) / 1e6:.2f} MB of text\n")
+
+    for label, texts in (("per page", pages), ("whole document", [document])):
+        print(f"-- {label}")
+        benchmark_splitter("RecursiveCharacterTextSplitter", RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=25), texts)
+        benchmark_splitter("TokenChunker", TokenChunker(800 // CHARS_PER_TOKEN, 25 // CHARS_PER_TOKEN), texts)
+        print()
@@ -0,0 +1,119 @@
+import argparse
+import random
+import statistics
+import time
+
+import numpy as np
+
+from chunker import chunk_pages, make_text_splitter
+from embeddings import TITAN_V2_DIMENSIONS, TitanEmbeddingFunction, get_embedding_function
+from page_cache import PageTextCache, extract_pages_cached
+
+PDF_PATH = "./s3-api.pdf"
+MODEL_ID = "amazon.titan-embed-text-v2:0"
+PRECISIONS = ("float32", "float16")
+
+
+def load_corpus(pdf_path, max_chunks, seed=0):
+    """Chunks pdf_path the way ingestion does and returns a reproducible sample of chunk texts."""
+    pages = extract_pages_cached(pdf_path, PageTextCache())
+    chunks = [text for text, _, _ in chunk_pages(pages, make_text_splitter(800, 25))]
+    random.Random(seed).shuffle(chunks)
+    return chunks[:max_chunks]
+
+
+def sample_queries(chunks, n_queries, seed=1):
+    """Without a question file, the first sentence of random chunks stands in for user questions."""
+    picked = random.Random(seed).sample(chunks, min(n_queries, len(chunks)))
+    return [chunk.split(". ")[0][:300] for chunk in picked]
+
+
+def embed_all(texts, dimensions, backend="titan"):
+    """Embeds texts at the given Titan v2 dimensions; returns (unit vectors, ms per text)."""
+    # cache=False so embed latency is the real Bedrock round trip (or local CPU time)
+    if backend == "titan":
+        embedding_function = TitanEmbeddingFunction(MODEL_ID, dimensions=dimensions, normalize=True, cache=False)
+    else:
+        embedding_function = get_embedding_function(backend, cache=False)
+    start = time.perf_counter()
+    vectors = np.asarray(embedding_function(texts), dtype=np.float32)
+    elapsed = time.perf_counter() - start
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors, elapsed * 1000 / len(texts)
+
+
+def to_float32(vectors):
+    """float16 is a storage format: numpy has no fast half-precision matmul, so scores are computed in float32."""
+    return vectors.astype(np.float32, copy=False)
+
+
+def top_k(index, queries, k):
+    scores = queries @ index.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def recall_at_k(found, truth):
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def benchmark(chunks, queries, k=5, repeats=5, backend="titan"):
+    """
+    Recall@k against the ranking of the first setting (1024 dims, float32),
+    index size and brute-force search latency for every dimensions/precision pair.
+
+    The local backend has a single output size, so it only compares precisions,
+    against its own float32 ranking; it runs without network access.
+    """
+    results = []
+    truth = None
+    dimension_options = sorted(TITAN_V2_DIMENSIONS, reverse=True) if backend == "titan" else [None]
+    for dimensions in dimension_options:
+        index, embed_ms = embed_all(chunks, dimensions, backend)
+        query_vectors, _ = embed_all(queries, dimensions, backend)
+        for precision in PRECISIONS:
+            stored = index.astype(precision)
+            # The upcast of the whole index is a one-off load cost, timed apart from the searches
+            start = time.perf_counter()
+            searchable = to_float32(stored)
+            cast_ms = (time.perf_counter() - start) * 1000
+            queries_cast = to_float32(query_vectors.astype(precision))
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                found = top_k(searchable, queries_cast, k)
+                timings.append((time.perf_counter() - start) * 1000 / len(queries))
+            if truth is None:
+                truth = found  # 1024 dims, float32: the reference ranking
+            results.append({
+                "dimensions": index.shape[1],
+                "precision": precision,
+                "recall": recall_at_k(found, truth),
+                "index_mb": stored.nbytes / 1024 / 1024,
+                "search_ms": statistics.median(timings),
+                "cast_ms": cast_ms,
+                "embed_ms": embed_ms,
+            })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall / size / latency of Titan v2 embedding settings")
+    parser.add_argument("pdf_path", nargs="?", default=PDF_PATH)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", help="file with one question per line (default: sampled from the corpus)")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--backend", default="titan", choices=["titan", "local"])
+    args = parser.parse_args()
+
+    chunks = load_corpus(args.pdf_path, args.chunks)
+    if args.queries:
+        with open(args.queries) as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        queries = sample_queries(chunks, 100)
+    print(f"{args.pdf_path}: {len(chunks)} chunks, {len(queries)} queries, k={args.k}\n")
+
+    print(f"{'dims':>5} {'precision':>9} {'recall@k':>9} {'index MB':>9} {'search ms':>10} {'cast ms':>8} {'embed ms':>9}")
+    for row in benchmark(chunks, queries, args.k, backend=args.backend):
+        print(f"{row['dimensions']:>5} {row['precision']:>9} {row['recall']:>9.3f} {row['index_mb']:>9.2f} "
+              f"{row['search_ms']:>10.3f} {row['cast_ms']:>8.2f} {row['embed_ms']:>9.1f}")
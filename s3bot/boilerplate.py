@@ -0,0 +1,133 @@
+import re
+from collections import Counter
+
+EDGE_LINES = 2  # lines at the top and bottom of a page checked for headers/footers
+EDGE_MIN_FRACTION = 0.5  # a header/footer must repeat on at least half the pages...
+ANYWHERE_MIN_FRACTION = 0.8  # ...other lines (legal notices) on most of them
+MIN_PAGES = 3
+ANYWHERE_MIN_LETTERS = 10  # shorter repeated lines ("}", "</Bucket>") are usually code, not notices
+CHARS_PER_TOKEN = 4  # rough estimate for English text, used only for reporting
+
+_DIGITS_RE = re.compile(r"\d+")
+_SPACE_RE = re.compile(r"\s+")
+_LETTER_RE = re.compile(r"[^\W\d_]")
+_EDGE_TEXT_RE = re.compile(r"[^\W_]|#")  # a letter, digit or masked number
+
+
+def normalize_line(line, mask_digits=False):
+    """
+    Lower-cases and collapses whitespace. With mask_digits, numbers become "#"
+    so "Page 3 of 200" matches "Page 4 of 200".
+    """
+    line = _SPACE_RE.sub(" ", line.strip().lower())
+    return _DIGITS_RE.sub("#", line) if mask_digits else line
+
+
+class BoilerplateFilter:
+    """
+    Learns the running headers, footers, page numbers and legal lines of one
+    document from its pages and removes them from page text before chunking.
+
+    A line is boilerplate when its digit-masked form appears in the top or
+    bottom EDGE_LINES of at least EDGE_MIN_FRACTION of the pages, or when the
+    exact line appears anywhere on at least ANYWHERE_MIN_FRACTION of them and
+    has at least ANYWHERE_MIN_LETTERS letters. Digits are only masked at the
+    page edges, where page numbers live, so numbered body lines are never
+    mistaken for boilerplate. Lines without a letter or digit (a lone "}")
+    are never boilerplate, and blank lines are kept so paragraph breaks
+    survive for the chunkers.
+
+    With a text_splitter, clean() also splits each page before and after
+    cleaning, so the report shows measured chunk counts.
+    """
+
+    def __init__(self, edge_lines=EDGE_LINES, edge_min_fraction=EDGE_MIN_FRACTION,
+                 anywhere_min_fraction=ANYWHERE_MIN_FRACTION, min_pages=MIN_PAGES,
+                 anywhere_min_letters=ANYWHERE_MIN_LETTERS, text_splitter=None):
+        self.edge_lines = edge_lines
+        self.edge_min_fraction = edge_min_fraction
+        self.anywhere_min_fraction = anywhere_min_fraction
+        self.min_pages = min_pages
+        self.anywhere_min_letters = anywhere_min_letters
+        self.text_splitter = text_splitter
+        self.edge_patterns = set()
+        self.anywhere_patterns = set()
+        self.chars_before = 0
+        self.chars_after = 0
+        self.chunks_before = 0
+        self.chunks_after = 0
+
+    def learn(self, page_texts):
+        """Learns the repeated lines from page_texts (all pages or a sample)."""
+        page_texts = [text for text in page_texts if text]
+        if len(page_texts) < self.min_pages:
+            return self
+
+        top, bottom, anywhere = Counter(), Counter(), Counter()
+        for text in page_texts:
+            lines = [line for line in text.splitlines() if line.strip()]
+            top.update({normalize_line(line, mask_digits=True) for line in lines[:self.edge_lines]})
+            bottom.update({normalize_line(line, mask_digits=True) for line in lines[-self.edge_lines:]})
+            anywhere.update({normalize_line(line) for line in lines})
+
+        edge_min = max(self.min_pages, self.edge_min_fraction * len(page_texts))
+        anywhere_min = max(self.min_pages, self.anywhere_min_fraction * len(page_texts))
+        self.edge_patterns = {line for line, n in (top + bottom).items()
+                              if n >= edge_min and _EDGE_TEXT_RE.search(line)}
+        self.anywhere_patterns = {line for line, n in anywhere.items()
+                                  if n >= anywhere_min and len(_LETTER_RE.findall(line)) >= self.anywhere_min_letters}
+        return self
+
+    def clean(self, text):
+        """Removes learned boilerplate lines from one page's text and records the savings."""
+        cleaned = text
+        if self.edge_patterns or self.anywhere_patterns:
+            lines = text.splitlines()
+            # Page edges are counted in non-blank lines, as in learn()
+            content = [idx for idx, line in enumerate(lines) if line.strip()]
+            edge_indexes = set(content[:self.edge_lines] + content[-self.edge_lines:])
+
+            kept = []
+            for idx, line in enumerate(lines):
+                if line.strip():
+                    if normalize_line(line) in self.anywhere_patterns:
+                        continue
+                    if idx in edge_indexes and normalize_line(line, mask_digits=True) in self.edge_patterns:
+                        continue
+                kept.append(line)
+            cleaned = "\n".join(kept).strip("\n")
+
+        self.chars_before += len(text)
+        self.chars_after += len(cleaned)
+        if self.text_splitter is not None:
+            self.chunks_before += len(self.text_splitter.split_text(text))
+            self.chunks_after += len(self.text_splitter.split_text(cleaned))
+        return cleaned
+
+    def report(self):
+        report = {
+            "patterns": len(self.edge_patterns | self.anywhere_patterns),
+            "chars_removed": self.chars_before - self.chars_after,
+            "tokens_removed": (self.chars_before - self.chars_after) // CHARS_PER_TOKEN,
+        }
+        if self.text_splitter is not None:
+            report.update(chunks_before=self.chunks_before, chunks_after=self.chunks_after)
+        return report
+
+    def print_report(self, source):
+        report = self.report()
+        message = f"{source}: stripped {report['patterns']} boilerplate lines, ~{report['tokens_removed']} tokens"
+        if "chunks_before" in report:
+            message += (f", {report['chunks_before'] - report['chunks_after']} page chunks saved "
+                        f"({report['chunks_before']} -> {report['chunks_after']})")
+        print(message)
+
+
+def strip_boilerplate(page_texts, text_splitter=None):
+    """
+    Learns the boilerplate from all page_texts and returns (cleaned texts, filter).
+    With text_splitter, the filter measures the chunks saved per page.
+    """
+    boilerplate = BoilerplateFilter(text_splitter=text_splitter).learn(page_texts)
+    cleaned = [boilerplate.clean(text) if text else text for text in page_texts]
+    return cleaned, boilerplate
@@ -0,0 +1,129 @@
+import time
+
+DEFAULT_MAX_BATCH_SIZE = 5000  # Chroma's limit is SQLite-derived; older clients do not report it
+EMBED_BATCH_SIZE = 200  # texts per embedding call; each finished call is kept in the embedding cache
+
+
+def max_batch_size(collection):
+    """The largest batch the collection's client accepts in one add/upsert call."""
+    client = getattr(collection, "_client", None)
+    try:
+        if hasattr(client, "get_max_batch_size"):
+            return client.get_max_batch_size()
+        if hasattr(client, "max_batch_size"):
+            return client.max_batch_size
+    except Exception:
+        pass
+    return DEFAULT_MAX_BATCH_SIZE
+
+
+class BulkWriter:
+    """
+    Buffers rows and writes them to a ChromaDB collection with one upsert per
+    batch of up to the client's maximum batch size.
+
+    Rows added without an embedding are embedded when the batch is flushed,
+    in calls of EMBED_BATCH_SIZE texts, so the embedding backend can spread
+    them over its workers (and the background rate-limit lane) while a
+    failure loses at most one call's work. Chroma then receives precomputed
+    embeddings and never calls the embedding function itself. upsert
+    semantics make a rewrite of an existing ID replace it instead of failing.
+
+    Rows stay buffered until their upsert succeeded. If a text cannot be
+    embedded, the rows of the sources in that call are dropped and a
+    RuntimeError naming those sources is raised; the other rows keep their
+    embeddings and are written by the next flush. A failed upsert keeps
+    every row, so the next flush retries it without embedding again.
+
+    stats records rows written and the seconds spent embedding and writing;
+    report() prints rows per second for both.
+    """
+
+    def __init__(self, collection, embedding_function=None, batch_size=None):
+        self.collection = collection
+        # .embed is the background (ingestion) lane of an EmbeddingBackend; plain callables work too
+        self.embed = getattr(embedding_function, "embed", embedding_function)
+        self.batch_size = min(batch_size or DEFAULT_MAX_BATCH_SIZE, max_batch_size(collection))
+        self.stats = {"rows": 0, "batches": 0, "embed_seconds": 0.0, "write_seconds": 0.0}
+        self._ids, self._documents, self._metadatas, self._embeddings = [], [], [], []
+
+    def add(self, chunk_id, document, metadata, embedding=None):
+        self._ids.append(chunk_id)
+        self._documents.append(document)
+        self._metadatas.append(metadata)
+        self._embeddings.append(embedding)
+        if len(self._ids) >= self.batch_size:
+            self.flush()
+
+    def add_many(self, ids, documents, metadatas, embeddings=None):
+        embeddings = embeddings if embeddings is not None else [None] * len(ids)
+        for row in zip(ids, documents, metadatas, embeddings):
+            self.add(*row)
+
+    def _source(self, idx):
+        return (self._metadatas[idx] or {}).get("source")
+
+    def _drop_sources(self, sources):
+        keep = [idx for idx in range(len(self._ids)) if self._source(idx) not in sources]
+        self._ids = [self._ids[idx] for idx in keep]
+        self._documents = [self._documents[idx] for idx in keep]
+        self._metadatas = [self._metadatas[idx] for idx in keep]
+        self._embeddings = [self._embeddings[idx] for idx in keep]
+
+    def _embed_missing(self):
+        missing = [idx for idx, embedding in enumerate(self._embeddings) if embedding is None]
+        if missing and self.embed is None:
+            raise ValueError("BulkWriter needs an embedding_function for rows without embeddings")
+        for offset in range(0, len(missing), EMBED_BATCH_SIZE):
+            part = missing[offset:offset + EMBED_BATCH_SIZE]
+            start = time.perf_counter()
+            try:
+                fresh = self.embed([self._documents[idx] for idx in part])
+            except Exception as e:
+                sources = {self._source(idx) for idx in part}
+                self._drop_sources(sources)
+                names = ", ".join(sorted(str(source) for source in sources))
+                raise RuntimeError(f"Embedding failed for chunks of {names}: {str(e)}") from e
+            finally:
+                self.stats["embed_seconds"] += time.perf_counter() - start
+            for idx, embedding in zip(part, fresh):
+                self._embeddings[idx] = embedding
+
+    def flush(self):
+        if not self._ids:
+            return
+        self._embed_missing()
+
+        while self._ids:
+            size = self.batch_size
+            start = time.perf_counter()
+            self.collection.upsert(ids=self._ids[:size], documents=self._documents[:size],
+                                   metadatas=self._metadatas[:size], embeddings=self._embeddings[:size])
+            self.stats["write_seconds"] += time.perf_counter() - start
+            self.stats["rows"] += len(self._ids[:size])
+            self.stats["batches"] += 1
+            del self._ids[:size], self._documents[:size], self._metadatas[:size], self._embeddings[:size]
+
+    def report(self):
+        rows = self.stats["rows"]
+        embed_s, write_s = self.stats["embed_seconds"], self.stats["write_seconds"]
+        total = embed_s + write_s
+        print(f"📦 Upserted {rows} chunks in {self.stats['batches']} batches: "
+              f"{rows / total if total else 0:.0f} rows/s overall "
+              f"(embedding {embed_s:.1f}s, {rows / embed_s if embed_s else 0:.0f} rows/s; "
+              f"writing {write_s:.1f}s, {rows / write_s if write_s else 0:.0f} rows/s)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+            self.report()
+
+
+def write_chunks(collection, embedding_function, ids, documents, metadatas, embeddings=None, batch_size=None):
+    """Upserts the rows in batches through a BulkWriter and returns its stats."""
+    with BulkWriter(collection, embedding_function, batch_size) as writer:
+        writer.add_many(ids, documents, metadatas, embeddings)
+    return writer.stats
@@ -6,6 +6,12 @@ import streamlit as st
 from PyPDF2 import PdfReader
 import chromadb
 from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from bulk_writer import BulkWriter
+from chunk_ids import make_chunk_id, new_chunk_indexes
+from chunker import CHUNK_OVERLAP, CHUNK_SIZE
+from embeddings import shared_titan_embedding
+from rate_limiter import INTERACTIVE, rate_limited
+from singleflight import singleflight
 
 # AWS Bedrock client
 brt = boto3.client(service_name="bedrock-runtime", region_name="us-east-1")
@@ -22,42 +28,10 @@ def load_image_as_base64(image_path):
 
 
 # Step 1: Read and Chunk PDF
-def read_and_chunk_pdf(pdf_path, chunk_size=800, chunk_overlap=25):
-    from langchain.text_splitter import RecursiveCharacterTextSplitter
-
-    pdf_reader = PdfReader(pdf_path)
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-
-    chunks = []
-    for page_num, page in enumerate(pdf_reader.pages):
-        text = page.extract_text()
-        if text:
-            split_docs = text_splitter.create_documents(
-                texts=[text],
-                metadatas=[{"page": page_num + 1}]
-            )
-            chunks.extend(split_docs)
-    return chunks
-
-
-# Step 2: Embedding Function using AWS Bedrock
-class TitanEmbeddingFunction:
-    def __init__(self, model_id, region="us-east-1"):
-        self.model_id = model_id
-        self.bedrock_runtime = boto3.client("bedrock-runtime", region_name=region)
-
-    def __call__(self, input: Documents) -> Embeddings:
-        embeddings = []
-        for text in input:
-            response = brt.invoke_model(
-                modelId=self.model_id,
-                contentType="application/json",
-                accept="application/json",
-                body=json.dumps({"inputText": text})
-            )
-            embedding = json.loads(response["body"].read())["embedding"]
-            embeddings.append(embedding)
-        return embeddings
+def read_and_chunk_pdf(pdf_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    # Same extraction, boilerplate stripping and cross-page chunking as every other ingest path
+    from pipeline import read_and_chunk_document
+    return read_and_chunk_document(pdf_path, chunk_size, chunk_overlap)
 
 
 # Step 3: Store Embeddings in ChromaDB
@@ -65,22 +39,21 @@ def store_embeddings_in_chromadb(chunks, embedding_function):
     client = chromadb.PersistentClient(path="./chromadb")
     collection = client.get_or_create_collection(name="my_collection", embedding_function=embedding_function)
 
-    existing_data = collection.get(include=["metadatas"])
-    existing_ids = {metadata.get("id") for metadata in existing_data["metadatas"] if "id" in metadata}
-
-    for idx, chunk in enumerate(chunks):
-        chunk_id = str(idx)
-        if chunk_id in existing_ids:
-            continue
-        collection.add(
-            documents=[chunk.page_content],
-            metadatas=[{"id": chunk_id, **chunk.metadata}],
-            ids=[chunk_id]
-        )
+    chunk_ids = [
+        make_chunk_id(chunk.metadata.get("source"), chunk.metadata.get("page"), chunk.page_content)
+        for chunk in chunks
+    ]
+
+    with BulkWriter(collection, embedding_function) as writer:
+        for idx in new_chunk_indexes(collection, chunk_ids):
+            chunk, chunk_id = chunks[idx], chunk_ids[idx]
+            writer.add(chunk_id, chunk.page_content, {"id": chunk_id, **chunk.metadata})
     return collection
 
 
 # Step 4: Generate Answer Using AWS Bedrock
+@singleflight("bedrock_answer")
+@rate_limited(INTERACTIVE)
 def generate_answer_with_bedrock(prompt, model_id, region="us-east-1"):
     client = boto3.client("bedrock-runtime", region_name=region)
     try:
@@ -107,7 +80,7 @@ def generate_answer_with_bedrock(prompt, model_id, region="us-east-1"):
 
 # Step 5: Query ChromaDB and Generate Response
 def query_chromadb_and_generate_response(user_query, embedding_function, collection, model_id, region="us-east-1"):
-    query_embedding = embedding_function([user_query])[0]
+    query_embedding = embedding_function.embed_query(user_query)
     results = collection.query(query_embedding, n_results=5)
 
     if not results or "documents" not in results or not results["documents"]:
@@ -125,7 +98,7 @@ st.set_page_config(page_title="AWS Bedrock Chatbot", page_icon="🤖", layout="w
 
 if "collection" not in st.session_state:
     with st.spinner("Initializing chromadb...."):
-        embedding_function = TitanEmbeddingFunction(model_id="amazon.titan-embed-text-v2:0")
+        embedding_function = shared_titan_embedding("amazon.titan-embed-text-v2:0")
         client = chromadb.PersistentClient(path="./chromadb")
         collection = client.get_or_create_collection(name="mycollection", embedding_function=embedding_function)
         existing_data = collection.get(include=["metadatas"])
@@ -225,7 +198,7 @@ with col2:
             model_id = "anthropic.claude-3-5-sonnet-20240620-v1:0"
             response = query_chromadb_and_generate_response(
                 user_query,
-                TitanEmbeddingFunction(model_id="amazon.titan-embed-text-v2:0"),
+                shared_titan_embedding("amazon.titan-embed-text-v2:0"),
                 st.session_state.collection,
                 model_id,
             )
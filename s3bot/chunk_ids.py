@@ -0,0 +1,122 @@
+import hashlib
+import os
+
+GET_BATCH_SIZE = 500
+
+
+def content_digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def source_name(path):
+    """
+    The "source" metadata every writer stores and every reader filters on:
+    the normalised path ("./pdf_dir/x.pdf" -> "pdf_dir/x.pdf"). URLs are
+    returned unchanged.
+    """
+    if not path or "://" in path:
+        return path
+    return os.path.normpath(path)
+
+
+def migrate_legacy_sources(collection, pdf_dir):
+    """
+    Older writers stored the bare file name as "source". Rewrites those rows
+    to source_name(pdf_dir/name) when the file is still in pdf_dir, so they
+    are replaced rather than duplicated on the next ingest, and deletes the
+    rows of files that are gone.
+
+    Returns:
+        tuple: (rows migrated, rows deleted)
+    """
+    existing = collection.get(include=["metadatas"])
+    migrate_ids, migrate_metadatas, delete_ids = [], [], []
+    for chunk_id, metadata in zip(existing["ids"], existing["metadatas"]):
+        source = (metadata or {}).get("source")
+        if not source or "://" in source or os.path.basename(source) != source:
+            continue
+        path = os.path.join(pdf_dir, source)
+        if os.path.exists(path):
+            migrate_ids.append(chunk_id)
+            migrate_metadatas.append({**metadata, "source": source_name(path)})
+        else:
+            delete_ids.append(chunk_id)
+    for start in range(0, len(migrate_ids), GET_BATCH_SIZE):
+        collection.update(ids=migrate_ids[start:start + GET_BATCH_SIZE],
+                          metadatas=migrate_metadatas[start:start + GET_BATCH_SIZE])
+    for start in range(0, len(delete_ids), GET_BATCH_SIZE):
+        collection.delete(ids=delete_ids[start:start + GET_BATCH_SIZE])
+    if migrate_ids or delete_ids:
+        print(f"Migrated {len(migrate_ids)} chunks to path sources, deleted {len(delete_ids)} chunks of removed files")
+    rekey_legacy_ids(collection)
+    return len(migrate_ids), len(delete_ids)
+
+
+def rekey_legacy_ids(collection):
+    """
+    Older IDs started with the bare file name, so files with the same name in
+    different directories shared IDs. Moves every row whose ID still starts
+    with the file name to the make_chunk_id of its source, reusing the stored
+    embedding, so existing stores keep skipping chunks they already hold.
+
+    Returns:
+        int: rows re-keyed
+    """
+    existing = collection.get(include=["metadatas"])
+    old_ids, new_ids = [], {}
+    for chunk_id, metadata in zip(existing["ids"], existing["metadatas"]):
+        source = (metadata or {}).get("source")
+        if not source or "://" in source or os.path.basename(source) == source:
+            continue
+        prefix = f"{os.path.basename(source)}:"
+        if chunk_id.startswith(prefix):
+            old_ids.append(chunk_id)
+            new_ids[chunk_id] = f"{source_name(source)}:{chunk_id[len(prefix):]}"
+    for start in range(0, len(old_ids), GET_BATCH_SIZE):
+        rows = collection.get(ids=old_ids[start:start + GET_BATCH_SIZE],
+                              include=["embeddings", "documents", "metadatas"])
+        ids = [new_ids[chunk_id] for chunk_id in rows["ids"]]
+        metadatas = [{**metadata, "id": new_id} if "id" in metadata else metadata
+                     for metadata, new_id in zip(rows["metadatas"], ids)]
+        # Write the new rows before deleting the old ones, so a failure never loses a chunk
+        collection.upsert(ids=ids, embeddings=rows["embeddings"], documents=rows["documents"], metadatas=metadatas)
+        collection.delete(ids=rows["ids"])
+    if old_ids:
+        print(f"Re-keyed {len(old_ids)} chunks to path-based IDs")
+    return len(old_ids)
+
+
+def make_chunk_id(source, page, text):
+    """
+    Stable chunk ID: source_name of the file, page and a digest of the chunk text.
+
+    Unlike hash() it is the same in every process, and unlike the enumerate
+    index it cannot collide across files, even files with the same name in
+    different directories. Identical text on the same page of
+    the same file maps to one ID, which is what we want for skip-if-present.
+    """
+    return f"{source_name(source or '')}:{page}:{content_digest(text)[:24]}"
+
+
+def existing_chunk_ids(collection, ids):
+    """Returns the subset of ids already stored in the collection."""
+    found = set()
+    for start in range(0, len(ids), GET_BATCH_SIZE):
+        found.update(collection.get(ids=ids[start:start + GET_BATCH_SIZE], include=[])["ids"])
+    return found
+
+
+def new_chunk_indexes(collection, ids):
+    """
+    Positions in ids that still need embedding: not in the collection yet and
+    not a repeat of an earlier ID in the same list.
+    """
+    existing = existing_chunk_ids(collection, list(set(ids)))
+    seen = set()
+    indexes = []
+    for idx, chunk_id in enumerate(ids):
+        if chunk_id in existing or chunk_id in seen:
+            continue
+        seen.add(chunk_id)
+        indexes.append(idx)
+    return indexes
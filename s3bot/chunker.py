@@ -0,0 +1,324 @@
+import bisect
+import functools
+import os
+import re
+
+import numpy as np
+from langchain.docstore.document import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+MAX_TOKENS = 200
+OVERLAP_TOKENS = 8
+CHARS_PER_TOKEN = 4
+# Chunk budget shared by every ingestion path, in characters (converted to tokens by make_text_splitter)
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 25
+# "token" (TokenChunker's token budget) or "character" (langchain's recursive splitter)
+CHUNKER = os.environ.get("CHUNKER", "token")
+# Bump when chunk boundaries or chunk IDs change, so manifests re-chunk old files
+CHUNKER_VERSION = "token-v2" if CHUNKER == "token" else "character-v2"
+PAGE_SEPARATOR = "\n\n"  # pages are joined as paragraphs, so a page break is a preferred cut
+
+# Approximate tokenizer: words and single punctuation marks. Titan and Claude
+# use BPE tokenizers that we can't run locally; this tracks them closely
+# enough to keep chunk token counts tight.
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_WORD_CHAR_RE = re.compile(r"\w")
+_SPACE_CHAR_RE = re.compile(r"\s")
+
+# Character classes for the vectorised scans below
+SPACE, WORD, PUNCT = 0, 1, 2
+
+
+def _char_class(char):
+    if _WORD_CHAR_RE.match(char):
+        return WORD
+    return SPACE if _SPACE_CHAR_RE.match(char) else PUNCT
+
+
+BMP_SIZE = 0x10000
+_SENTENCE_END = np.zeros(BMP_SIZE, dtype=bool)
+_SENTENCE_END[[ord(char) for char in ".!?"]] = True
+
+
+@functools.lru_cache(maxsize=None)
+def _bmp_classes():
+    """Class of every Basic Multilingual Plane character, built once on first use."""
+    return np.array([_char_class(chr(code)) for code in range(BMP_SIZE)], dtype=np.int8)
+
+
+def _code_points(text):
+    return np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+
+
+def char_classes(codes):
+    """SPACE/WORD/PUNCT for every code point, matching the regex \\w and \\s classes."""
+    table = _bmp_classes()
+    if not len(codes) or codes.max() < BMP_SIZE:
+        return table[codes]
+    classes = table[np.minimum(codes, BMP_SIZE - 1)]
+    astral = codes >= BMP_SIZE
+    classes[astral] = [_char_class(chr(code)) for code in codes[astral]]
+    return classes
+
+
+def token_offsets(text, classes=None):
+    """
+    Character offsets at which each token starts, as a numpy array: the
+    starts of _TOKEN_RE matches, computed with array operations instead of
+    a Python loop over the matches.
+    """
+    if classes is None:
+        classes = char_classes(_code_points(text))
+    word = classes == WORD
+    starts = classes == PUNCT
+    starts[0:1] |= word[0:1]
+    starts[1:] |= word[1:] & ~word[:-1]
+    return np.flatnonzero(starts)
+
+
+def _boundaries(length, classes, line_ends, sentence_ends):
+    """Merges the offsets after line breaks with the ends of the whitespace runs that follow a sentence end."""
+    run_ends = []
+    run = sentence_ends[sentence_ends < length]
+    run = run[classes[run] == SPACE]
+    # Walk every run forward one character at a time; only runs still in whitespace stay in the array
+    while len(run):
+        run = run + 1
+        done = (run == length) | (classes[np.minimum(run, length - 1)] != SPACE)
+        run_ends.append(run[done])
+        run = run[~done]
+    return np.unique(np.concatenate([[0, length], line_ends, *run_ends])).astype(np.int64)
+
+
+def boundary_offsets(text, classes=None, codes=None):
+    """
+    Sorted character offsets where a chunk may start: after a line break
+    (which includes every paragraph break) or after the whitespace that
+    follows a sentence end.
+    """
+    if codes is None:
+        codes = _code_points(text)
+    if classes is None:
+        classes = char_classes(codes)
+    line_ends = np.flatnonzero(codes == 10) + 1
+    sentence_ends = np.flatnonzero(_SENTENCE_END[np.minimum(codes, BMP_SIZE - 1)]) + 1
+    return _boundaries(len(codes), classes, line_ends, sentence_ends)
+
+
+@functools.lru_cache(maxsize=None)
+def _latin1_tables():
+    """bytes.translate tables for Latin-1 text: the class of every byte, and 1 for a line break, 2 for a sentence end."""
+    classes = bytes(_char_class(chr(code)) for code in range(256))
+    marks = bytes(1 if code == 10 else 2 if _SENTENCE_END[code] else 0 for code in range(256))
+    return classes, marks
+
+
+def scan_text(text):
+    """
+    (token offsets, boundary offsets) of text. Latin-1 text, which is nearly
+    all extracted PDF text, is classified with two bytes.translate calls
+    instead of a gather over a code point table; other text takes the
+    general path.
+    """
+    try:
+        raw = text.encode("latin-1")
+    except UnicodeEncodeError:
+        codes = _code_points(text)
+        classes = char_classes(codes)
+        return token_offsets(text, classes), boundary_offsets(text, classes, codes)
+    class_table, mark_table = _latin1_tables()
+    classes = np.frombuffer(raw.translate(class_table), dtype=np.int8)
+    marks = np.frombuffer(raw.translate(mark_table), dtype=np.int8)
+    line_ends = np.flatnonzero(marks == 1) + 1
+    sentence_ends = np.flatnonzero(marks == 2) + 1
+    return token_offsets(text, classes), _boundaries(len(raw), classes, line_ends, sentence_ends)
+
+
+class TokenChunker:
+    """
+    Splits text into chunks of at most max_tokens tokens, cutting on
+    paragraph/sentence/line boundaries.
+
+    All boundary and token offsets are computed once per text with array
+    operations over the text's code points (no per-token Python work); each
+    cut is then a bisect over the cumulative token counts, so the work per
+    chunk does not depend on the chunk length. A single sentence longer than
+    the budget is cut at a token boundary.
+
+    Exposes split_text and create_documents so it can stand in for
+    langchain's RecursiveCharacterTextSplitter.
+    """
+
+    def __init__(self, max_tokens=MAX_TOKENS, overlap_tokens=OVERLAP_TOKENS):
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def chunk_spans(self, text):
+        """Returns [(start_char, end_char), ...] of the chunks of text."""
+        tokens, boundaries = scan_text(text)
+        if len(tokens) == 0:
+            return []
+        # Number of tokens starting before each boundary; the cut loop runs on
+        # plain lists because a few dozen bisects beat numpy's per-call overhead
+        tokens_before = np.searchsorted(tokens, boundaries, side="left").tolist()
+        boundaries = boundaries.tolist()
+
+        spans = []
+        start = 0  # index into boundaries
+        last = len(boundaries) - 1
+        while start < last:
+            budget_end = tokens_before[start] + self.max_tokens
+            end = bisect.bisect_right(tokens_before, budget_end) - 1
+            if end <= start:
+                # No boundary within budget: hard cut after max_tokens tokens
+                cut = int(tokens[tokens_before[start] + self.max_tokens])
+                spans.append((boundaries[start], cut))
+                boundaries.insert(start + 1, cut)
+                tokens_before.insert(start + 1, tokens_before[start] + self.max_tokens)
+                last += 1
+                start += 1
+                continue
+
+            spans.append((boundaries[start], boundaries[end]))
+            if end == last:
+                break
+            # Step back so the next chunk repeats up to overlap_tokens tokens
+            next_start = bisect.bisect_left(tokens_before, tokens_before[end] - self.overlap_tokens)
+            start = max(next_start, start + 1)
+        return [(s, e) for s, e in spans if text[s:e].strip()]
+
+    def split_text(self, text):
+        return [text[start:end].strip() for start, end in self.chunk_spans(text)]
+
+    def create_documents(self, texts, metadatas=None):
+        documents = []
+        for idx, text in enumerate(texts):
+            metadata = metadatas[idx] if metadatas else {}
+            documents.extend(Document(page_content=chunk, metadata=dict(metadata)) for chunk in self.split_text(text))
+        return documents
+
+
+class CharacterChunker:
+    """
+    langchain's RecursiveCharacterTextSplitter with the chunk_spans interface
+    PageSpanChunker needs. Each chunk is located in the text with str.find,
+    starting after the previous chunk's start, the way langchain's own
+    add_start_index does.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+        self.splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+    def chunk_spans(self, text):
+        spans = []
+        offset = 0
+        for chunk in self.splitter.split_text(text):
+            start = text.find(chunk, offset)
+            if start < 0:
+                continue
+            spans.append((start, start + len(chunk)))
+            offset = start + 1
+        return spans
+
+    def split_text(self, text):
+        return self.splitter.split_text(text)
+
+    def create_documents(self, texts, metadatas=None):
+        return self.splitter.create_documents(texts, metadatas=metadatas)
+
+
+class PageSpanChunker:
+    """
+    Chunks a document as one continuous text while it is fed page by page,
+    so sentences that cross a page break stay together and short page tails
+    merge into the next page's chunk.
+
+    A page-offset table maps every chunk back to the pages it covers.
+    add_page returns the chunks that can no longer change; the last, still
+    growing chunk is held back until the next page or flush(). Only that tail
+    is kept between pages, so memory stays bounded by one page plus one chunk.
+
+    Chunks are returned as (text, page_start, page_end).
+    """
+
+    def __init__(self, chunker):
+        self.chunker = chunker
+        self._reset()
+
+    def _reset(self):
+        self._text = ""
+        self._offsets = []  # start offset of each page within _text
+        self._pages = []
+
+    def _page_at(self, offset):
+        return self._pages[bisect.bisect_right(self._offsets, offset) - 1]
+
+    def _chunks(self, spans):
+        chunks = []
+        for start, end in spans:
+            raw = self._text[start:end]
+            start += len(raw) - len(raw.lstrip())
+            end -= len(raw) - len(raw.rstrip())
+            chunks.append((self._text[start:end], self._page_at(start), self._page_at(end - 1)))
+        return chunks
+
+    def add_page(self, page_num, text):
+        if not text:
+            return []
+        if self._text:
+            self._text += PAGE_SEPARATOR
+        self._offsets.append(len(self._text))
+        self._pages.append(page_num)
+        self._text += text
+
+        spans = self.chunker.chunk_spans(self._text)
+        if len(spans) <= 1:
+            return []
+        chunks = self._chunks(spans[:-1])
+
+        # Keep only the tail that the next page may still extend
+        keep_from = spans[-1][0]
+        first_page = bisect.bisect_right(self._offsets, keep_from) - 1
+        self._text = self._text[keep_from:]
+        self._offsets = [0] + [offset - keep_from for offset in self._offsets[first_page + 1:]]
+        self._pages = self._pages[first_page:]
+        return chunks
+
+    def flush(self):
+        chunks = self._chunks(self.chunker.chunk_spans(self._text)) if self._text else []
+        self._reset()
+        return chunks
+
+
+def chunk_pages(pages, chunker=None):
+    """
+    Cross-page chunking of [(page_number, text), ...].
+
+    Returns:
+        list: (text, page_start, page_end) tuples in document order.
+    """
+    span_chunker = PageSpanChunker(chunker or make_text_splitter())
+    chunks = []
+    for page_num, text in pages:
+        chunks.extend(span_chunker.add_page(page_num, text))
+    chunks.extend(span_chunker.flush())
+    return chunks
+
+
+def count_tokens(text):
+    return len(_TOKEN_RE.findall(text))
+
+
+def make_text_splitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    The splitter behind pipeline.iter_document_chunks: a TokenChunker whose
+    budget is the character budget converted at CHARS_PER_TOKEN, or with
+    CHUNKER=character langchain's recursive splitter (CharacterChunker).
+    """
+    if CHUNKER == "character":
+        return CharacterChunker(chunk_size, chunk_overlap)
+    max_tokens = max(1, chunk_size // CHARS_PER_TOKEN)
+    return TokenChunker(max_tokens, min(max_tokens - 1, chunk_overlap // CHARS_PER_TOKEN))
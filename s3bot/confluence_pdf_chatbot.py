@@ -6,6 +6,9 @@ import streamlit as st
 from PyPDF2 import PdfReader
 import chromadb
 from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from chunk_ids import make_chunk_id, new_chunk_indexes, source_name
+from chunker import CHUNK_OVERLAP, CHUNK_SIZE
+from embeddings import shared_titan_embedding
 from atlassian import Confluence  # Confluence API
 
 # AWS Bedrock Client
@@ -62,44 +65,13 @@ def export_all_confluence_pages():
 export_all_confluence_pages()
 
 # Function: Read and Chunk PDF
-def read_and_chunk_pdf(pdf_path, chunk_size=800, chunk_overlap=25):
-    from langchain.text_splitter import RecursiveCharacterTextSplitter
-
-    pdf_reader = PdfReader(pdf_path)
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-
-    chunks = []
-    for page_num, page in enumerate(pdf_reader.pages):
-        text = page.extract_text()
-        if text:
-            split_docs = text_splitter.create_documents(
-                texts=[text],
-                metadatas=[{"page": page_num + 1}]
-            )
-            chunks.extend(split_docs)
-    return chunks
-
-# Function: Embedding using AWS Bedrock
-class TitanEmbeddingFunction:
-    def __init__(self, model_id, region="us-east-1"):
-        self.model_id = model_id
-        self.bedrock_runtime = boto3.client("bedrock-runtime", region_name=region)
-
-    def __call__(self, input: Documents) -> Embeddings:
-        embeddings = []
-        for text in input:
-            response = brt.invoke_model(
-                modelId=self.model_id,
-                contentType="application/json",
-                accept="application/json",
-                body=json.dumps({"inputText": text})
-            )
-            embedding = json.loads(response["body"].read())["embedding"]
-            embeddings.append(embedding)
-        return embeddings
+def read_and_chunk_pdf(pdf_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    # Same extraction, boilerplate stripping and cross-page chunking as every other ingest path
+    from pipeline import read_and_chunk_document
+    return read_and_chunk_document(pdf_path, chunk_size, chunk_overlap)
 
 # Initialize ChromaDB
-embedding_function = TitanEmbeddingFunction(model_id="amazon.titan-embed-text-v2:0")
+embedding_function = shared_titan_embedding("amazon.titan-embed-text-v2:0")
 client = chromadb.PersistentClient(path="./chromadb")
 collection = client.get_or_create_collection(name="my_collection", embedding_function=embedding_function)
 
@@ -111,11 +83,12 @@ if not existing_data["metadatas"]:
     for pdf_file in os.listdir(PDF_DIR):
         pdf_path = os.path.join(PDF_DIR, pdf_file)
         chunks = read_and_chunk_pdf(pdf_path)
-        for chunk in chunks:
+        chunk_ids = [make_chunk_id(pdf_path, chunk.metadata.get("page"), chunk.page_content) for chunk in chunks]
+        for idx in new_chunk_indexes(collection, chunk_ids):
             collection.add(
-                documents=[chunk.page_content],
-                metadatas=[chunk.metadata],
-                ids=[str(hash(chunk.page_content))]
+                documents=[chunks[idx].page_content],
+                metadatas=[{**chunks[idx].metadata, "source": source_name(pdf_path)}],
+                ids=[chunk_ids[idx]]
             )
 
     st.success("Embeddings have been generated and stored!")
@@ -175,7 +148,7 @@ with col2:
     if st.button("Submit"):
         with st.spinner("Processing..."):
             response = collection.query(
-                embedding_function([user_query])[0], n_results=5
+                embedding_function.embed_query(user_query), n_results=5
             )
             if response["documents"]:
                 context = " ".join([doc for doc_list in response["documents"] for doc in doc_list])
@@ -1,7 +1,17 @@
 import re
 import requests
+from embeddings import shared_titan_embedding
+from incremental import reingest_changed_pages
+from numpy_index import open_vector_store
+
 # Function: Export a single Confluence Page to PDF (if missing)
-def export_page_to_pdf(page_id, output_dir="pdf_dir"):
+def export_page_to_pdf(page_id, output_dir="pdf_dir", collection=None, embedding_function=None):
+    """
+    Exports a Confluence page to PDF.
+
+    When a collection is given, an existing PDF is re-exported and only the
+    pages whose text changed are re-embedded; otherwise it is skipped.
+    """
     try:
         page_info = confluence.get_page_by_id(page_id)
         
@@ -10,8 +20,8 @@ def export_page_to_pdf(page_id, output_dir="pdf_dir"):
         
         file_path = f"{output_dir}/{page_id}_{page_title}.pdf"
 
-        # Skip if the PDF already exists
-        if os.path.exists(file_path):
+        # Skip if the PDF already exists (unless we can diff it against the index)
+        if os.path.exists(file_path) and collection is None:
             print(f"Skipping existing PDF: {file_path}")
             return
 
@@ -24,6 +34,9 @@ def export_page_to_pdf(page_id, output_dir="pdf_dir"):
             pdf_file.write(pdf_export)
         print(f"Saved page '{page_title}' (ID: {page_id}) to {file_path}")
 
+        if collection is not None:
+            reingest_changed_pages(file_path, embedding_function, collection)
+
     except Exception as e:
         print(f"Failed to export page [{page_id}] to PDF: {str(e)}")
 
@@ -33,10 +46,10 @@ import requests
 
 import requests
 
-def export_page_and_children(page_id):
+def export_page_and_children(page_id, collection=None, embedding_function=None):
     try:
         # Step 1: Always Export the Parent Page
-        export_page_to_pdf(page_id)
+        export_page_to_pdf(page_id, collection=collection, embedding_function=embedding_function)
 
         # Step 2: Try to Get Child Pages
         try:
@@ -49,7 +62,7 @@ def export_page_and_children(page_id):
         if child_pages:
             print(f"✅ Page ID {page_id} has {len(child_pages)} child pages. Exporting all...")
             for child in child_pages:
-                export_page_to_pdf(child["id"])  # Recursively export child pages
+                export_page_to_pdf(child["id"], collection=collection, embedding_function=embedding_function)
         else:
             print(f"✅ Page ID {page_id} has no child pages. Only exporting the parent.")
 
@@ -59,9 +72,11 @@ def export_page_and_children(page_id):
 
 
 # Function: Export All Confluence Pages (Handles Parent & Children)
-def export_all_confluence_pages():
+def export_all_confluence_pages(collection=None, embedding_function=None):
+    """Exports every page in PAGE_IDS; with a collection, re-exported pages are diffed and only changes re-embedded."""
     for page_id in PAGE_IDS:
-        export_page_and_children(page_id)
+        export_page_and_children(page_id, collection, embedding_function)
 
-# Run Confluence PDF Export
-export_all_confluence_pages()
+# Run Confluence PDF Export, keeping the shared vector store in sync with the re-exported pages
+embedding_function = shared_titan_embedding("amazon.titan-embed-text-v2:0")
+export_all_confluence_pages(open_vector_store(embedding_function), embedding_function)
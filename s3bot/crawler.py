@@ -0,0 +1,330 @@
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urldefrag, urljoin, urlsplit
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+from chunk_ids import existing_chunk_ids, source_name
+from pipeline import ingest_pdfs_streaming, iter_document_pages
+
+CRAWL_CACHE_PATH = "./crawl_cache.sqlite3"
+EXTERNAL_PDF_DIR = "./external_pdfs"
+PER_HOST_LIMIT = 4  # concurrent requests per host, so one wiki is not hammered
+TOTAL_LIMIT = 32  # concurrent requests overall
+MAX_DEPTH = 1  # 0 fetches only the links found in the PDFs, 1 also follows links on those pages
+MAX_BYTES = 50 * 1024 * 1024
+TEXT_TAGS = ["h1", "h2", "h3", "h4", "p", "li", "pre", "td"]
+
+_DONE = object()
+
+
+async def read_limited(response, max_bytes, chunk_size=64 * 1024):
+    """
+    Reads the response body, or returns None as soon as it grows past max_bytes.
+
+    Content-Length is missing on chunked responses and may understate the
+    body, so the limit is enforced on the bytes actually received.
+    """
+    parts = []
+    total = 0
+    async for part in response.content.iter_chunked(chunk_size):
+        total += len(part)
+        if total > max_bytes:
+            return None
+        parts.append(part)
+    return b"".join(parts)
+
+
+class ConditionalCache:
+    """
+    Validators (ETag / Last-Modified) of every fetched URL, plus the links found
+    on it, so a revisit can send a conditional GET and still follow the page's
+    links when the server answers 304 Not Modified.
+    """
+
+    def __init__(self, path=CRAWL_CACHE_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " url TEXT PRIMARY KEY,"
+                " etag TEXT,"
+                " last_modified TEXT,"
+                " content_type TEXT,"
+                " links TEXT NOT NULL,"
+                " fetched_at REAL NOT NULL)"
+            )
+
+    def conditional_headers(self, url):
+        with self._lock:
+            row = self._conn.execute("SELECT etag, last_modified FROM responses WHERE url = ?", (url,)).fetchone()
+        headers = {}
+        if row and row[0]:
+            headers["If-None-Match"] = row[0]
+        if row and row[1]:
+            headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def links(self, url):
+        with self._lock:
+            row = self._conn.execute("SELECT links FROM responses WHERE url = ?", (url,)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def store(self, url, etag, last_modified, content_type, links):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (url, etag, last_modified, content_type, links, fetched_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, content_type, json.dumps(links), time.time()),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def parse_html(html, base_url):
+    """Returns (visible text of the content tags, absolute http(s) links) of an HTML page."""
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(["script", "style", "nav", "header", "footer"]):
+        tag.decompose()
+    text = "\n".join(node.get_text(" ", strip=True) for node in soup.find_all(TEXT_TAGS))
+    links = []
+    for anchor in soup.find_all("a", href=True):
+        link = urldefrag(urljoin(base_url, anchor["href"]))[0]
+        if link.startswith(("http://", "https://")):
+            links.append(link)
+    return text, sorted(set(links))
+
+
+def pdf_save_path(url, save_dir=EXTERNAL_PDF_DIR):
+    """Stable local file name for a downloaded PDF; the URL hash keeps same-named files apart."""
+    name = os.path.basename(urlsplit(url).path) or "document.pdf"
+    if not name.endswith(".pdf"):
+        name += ".pdf"
+    return os.path.join(save_dir, f"{hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]}_{name}")
+
+
+class Crawler:
+    """
+    Fetches URLs concurrently with asyncio, at most per_host requests per host
+    and total overall, following links up to max_depth.
+
+    Every request is a conditional GET against ConditionalCache, so unchanged
+    pages cost a single 304 and are not re-ingested. New or changed documents
+    are handed to on_document as ("pdf", url, local_path, validators) or
+    ("html", url, text, validators), where validators is
+    (etag, last_modified, content_type, links). on_document runs on a
+    dedicated delivery thread, so it may block (for example on a bounded
+    queue) without stalling the event loop, and the caller stores the
+    validators with cache.store once the document is ingested. Responses
+    with nothing to ingest are cached right away.
+    """
+
+    def __init__(self, on_document, max_depth=MAX_DEPTH, per_host=PER_HOST_LIMIT, total=TOTAL_LIMIT,
+                 same_host=True, cache=None, save_dir=EXTERNAL_PDF_DIR, timeout=30, max_bytes=MAX_BYTES):
+        self.on_document = on_document
+        self.max_depth = max_depth
+        self.per_host = per_host
+        self.total = total
+        self.same_host = same_host
+        self.cache = cache or ConditionalCache()
+        self.save_dir = save_dir
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self._host_limits = {}
+        self.stats = {"fetched": 0, "not_modified": 0, "skipped": 0, "errors": 0}
+
+    def _host_limit(self, host):
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        return self._host_limits[host]
+
+    async def fetch(self, session, url):
+        """Fetches one URL and returns the links found on it (cached links on a 304)."""
+        async with self._host_limit(urlsplit(url).netloc):
+            async with session.get(url, headers=self.cache.conditional_headers(url)) as response:
+                if response.status == 304:
+                    self.stats["not_modified"] += 1
+                    return self.cache.links(url)
+                if response.status != 200:
+                    raise RuntimeError(f"HTTP {response.status}")
+                if (response.content_length or 0) > self.max_bytes:
+                    self.stats["skipped"] += 1
+                    return []
+
+                content_type = response.headers.get("Content-Type", "")
+                etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+                kind = body = None
+                if "application/pdf" in content_type or urlsplit(url).path.endswith(".pdf"):
+                    kind, body = "pdf", await read_limited(response, self.max_bytes)
+                elif "text/html" in content_type:
+                    kind, body = "html", await read_limited(response, self.max_bytes)
+                    if body is not None:
+                        body = body.decode(response.charset or "utf-8", errors="replace")
+                if kind is not None and body is None:
+                    self.stats["skipped"] += 1
+                    return []
+
+        # The response is released before the hand-off, which may wait for ingestion
+        self.stats["fetched"] += 1
+        links = []
+        document = None
+        if kind == "pdf":
+            pdf_path = pdf_save_path(url, self.save_dir)
+            with open(pdf_path, "wb") as f:
+                f.write(body)
+            document = ("pdf", url, pdf_path)
+        elif kind == "html":
+            text, links = parse_html(body, url)
+            if text:
+                document = ("html", url, text)
+        else:
+            self.stats["skipped"] += 1
+
+        if document is None:
+            self.cache.store(url, etag, last_modified, content_type, links)
+        else:
+            await asyncio.get_running_loop().run_in_executor(
+                self._delivery, self.on_document, (*document, (etag, last_modified, content_type, links)))
+        return links
+
+    async def crawl(self, urls):
+        os.makedirs(self.save_dir, exist_ok=True)
+        seed_hosts = {urlsplit(url).netloc for url in urls}
+        seen = set(urls)
+        work = asyncio.Queue()
+        for url in urls:
+            work.put_nowait((url, 0))
+
+        async def worker(session):
+            while True:
+                url, depth = await work.get()
+                try:
+                    links = await self.fetch(session, url)
+                    if depth < self.max_depth:
+                        for link in links:
+                            if link in seen or (self.same_host and urlsplit(link).netloc not in seed_hosts):
+                                continue
+                            seen.add(link)
+                            work.put_nowait((link, depth + 1))
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    print(f"Failed to fetch content from {url}: {str(e)}")
+                finally:
+                    work.task_done()
+
+        connector = aiohttp.TCPConnector(limit=self.total)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        # One thread keeps deliveries in order and off the default executor, which resolves DNS
+        self._delivery = ThreadPoolExecutor(max_workers=1)
+        try:
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+                workers = [asyncio.create_task(worker(session)) for _ in range(self.total)]
+                await work.join()
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+        finally:
+            self._delivery.shutdown(wait=True)
+        print(f"🌐 Crawled {len(seen)} URLs: {self.stats}")
+        return self.stats
+
+
+def crawl_pages(urls, delivered, **crawler_options):
+    """
+    Runs the crawler in a background thread and yields its documents as
+    pipeline page tuples, so fetching overlaps with chunking and embedding.
+
+    HTML pages become a single page (url, 1, text, {"url": url}); downloaded
+    PDFs are extracted page by page with iter_document_pages. The hand-off
+    queue is bounded, so the crawler pauses when ingestion falls behind.
+
+    delivered is filled with {url: {"source", "validators", "extracted"}} for
+    every document handed over; "extracted" is False when a PDF failed to read.
+    """
+    documents = queue.Queue(maxsize=16)
+
+    def run():
+        try:
+            asyncio.run(Crawler(documents.put, **crawler_options).crawl(urls))
+        except Exception as e:
+            print(f"Error crawling URLs: {str(e)}")
+        finally:
+            documents.put(_DONE)
+
+    threading.Thread(target=run, daemon=True).start()
+    for kind, url, payload, validators in iter(documents.get, _DONE):
+        source = url if kind == "html" else payload
+        delivered[url] = {"source": source_name(source), "validators": validators, "extracted": True}
+        if kind == "html":
+            yield url, 1, payload, {"url": url}
+            continue
+        try:
+            for pdf_path, page_num, text, extra in iter_document_pages(payload):
+                yield pdf_path, page_num, text, {**extra, "url": url}
+        except Exception as e:
+            delivered[url]["extracted"] = False
+            print(f"Error reading {payload} from {url}: {str(e)}")
+
+
+def commit_documents(collection, cache, delivered, chunk_ids):
+    """
+    Finishes the crawled documents whose chunks are all stored: deletes the
+    chunks an earlier version of the same URL left behind, then records the
+    URL's validators, so the next crawl gets a 304. A document with missing
+    chunks keeps its old chunks and no validators, so it is fetched and
+    ingested again next time.
+
+    Returns:
+        tuple: (documents committed, stale chunks deleted)
+    """
+    committed = deleted = 0
+    for url, document in delivered.items():
+        produced = chunk_ids.get(document["source"], set())
+        if not document["extracted"] or existing_chunk_ids(collection, list(produced)) != produced:
+            print(f"⚠️ {url} was not fully stored; it will be retried on the next crawl")
+            continue
+        indexed = set(collection.get(where={"source": document["source"]}, include=[])["ids"])
+        stale = sorted(indexed - produced)
+        if stale:
+            collection.delete(ids=stale)
+            deleted += len(stale)
+        cache.store(url, *document["validators"])
+        committed += 1
+    return committed, deleted
+
+
+def ingest_urls(urls, embedding_function, collection, cache=None, **crawler_options):
+    """Crawls urls and streams every new or changed document into collection."""
+    cache = cache or ConditionalCache()
+    delivered, chunk_ids = {}, {}
+    result = ingest_pdfs_streaming([], embedding_function, collection, chunk_ids=chunk_ids,
+                                   pages=crawl_pages(urls, delivered, cache=cache, **crawler_options))
+    committed, deleted = commit_documents(collection, cache, delivered, chunk_ids)
+    print(f"Committed {committed}/{len(delivered)} crawled documents, deleted {deleted} stale chunks")
+    result.update(documents=len(delivered), committed=committed, stale_deleted=deleted)
+    return result
+
+
+if __name__ == "__main__":
+    import sys
+
+    from external_links import extract_hyperlinks_from_pdf
+
+    urls = extract_hyperlinks_from_pdf(sys.argv[1] if len(sys.argv) > 1 else "pdf_dir")
+    print(f"Found {len(urls)} hyperlinks")
+    found = []
+    asyncio.run(Crawler(found.append, max_depth=0).crawl(urls))
+    for kind, url, payload, _ in found:
+        print(f"{kind:<5} {url} -> {payload if kind == 'pdf' else f'{len(payload)} chars'}")
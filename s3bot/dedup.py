@@ -0,0 +1,147 @@
+import re
+import threading
+import zlib
+
+import numpy as np
+
+NUM_PERM = 128
+BANDS = 16  # 16 bands x 8 rows: pairs above ~0.7 Jaccard become LSH candidates
+SHINGLE_WORDS = 5
+SIMILARITY_THRESHOLD = 0.8
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD_RE = re.compile(r"\w+")
+
+
+class MinHasher:
+    """MinHash signatures over word shingles, vectorised with numpy."""
+
+    def __init__(self, num_perm=NUM_PERM, shingle_words=SHINGLE_WORDS, seed=1):
+        rng = np.random.RandomState(seed)
+        self.shingle_words = shingle_words
+        self.a = rng.randint(1, 1 << 31, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, 1 << 31, size=num_perm).astype(np.uint64)
+
+    def shingles(self, text):
+        words = _WORD_RE.findall(text.lower())
+        if len(words) <= self.shingle_words:
+            return {" ".join(words)}
+        return {" ".join(words[i:i + self.shingle_words]) for i in range(len(words) - self.shingle_words + 1)}
+
+    def signature(self, text):
+        # crc32 is stable across processes, unlike hash()
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in self.shingles(text)), dtype=np.uint64)
+        permuted = (np.outer(hashes, self.a) + self.b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0)
+
+
+class NearDuplicateIndex:
+    """
+    LSH index over MinHash signatures.
+
+    add() returns the key of an earlier near-duplicate when there is one
+    (estimated Jaccard similarity >= threshold), otherwise it stores the text
+    under key and returns None.
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, num_perm=NUM_PERM, bands=BANDS):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = {}
+        self._lock = threading.Lock()
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def add(self, key, text):
+        signature = self.hasher.signature(text)
+        band_keys = self._band_keys(signature)
+        with self._lock:
+            candidates = set()
+            for band, band_key in enumerate(band_keys):
+                candidates.update(self._buckets[band].get(band_key, ()))
+            for candidate in candidates:
+                if np.mean(self._signatures[candidate] == signature) >= self.threshold:
+                    return candidate
+
+            self._signatures[key] = signature
+            for band, band_key in enumerate(band_keys):
+                self._buckets[band].setdefault(band_key, []).append(key)
+            return None
+
+
+def source_ref(metadata):
+    return f"{metadata.get('source', '')}:{metadata.get('page', '')}"
+
+
+class ChunkDeduplicator:
+    """
+    Collapses near-duplicate chunks ({"text", "metadata"} dicts) into the
+    first copy seen in the same source. The kept chunk lists every copy in
+    metadata["sources"] as "source:page" entries joined by "; " (Chroma
+    metadata must be scalar).
+
+    Copies are only collapsed within one source (file or URL): the watcher
+    and re-ingestion delete chunks by source, and a kept chunk standing in
+    for another file's text would take that text with it.
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self.indexes = {}  # source -> NearDuplicateIndex
+        self.kept = {}
+        self.seen = 0
+        self.collapsed = 0
+
+    def __call__(self, chunk):
+        """Pipeline stage form: returns [chunk] to keep it, [] if it was collapsed."""
+        return [chunk] if self.add(chunk) else []
+
+    def add(self, chunk):
+        key = self.seen
+        self.seen += 1
+        source = chunk["metadata"].get("source")
+        if source not in self.indexes:
+            self.indexes[source] = NearDuplicateIndex(self.threshold)
+        canonical = self.indexes[source].add(key, chunk["text"])
+        if canonical is None:
+            chunk["metadata"]["sources"] = source_ref(chunk["metadata"])
+            # Keep only the ID and the (shared) metadata dict, not the text
+            self.kept[key] = {"id": chunk.get("id"), "metadata": chunk["metadata"]}
+            return True
+
+        self.collapsed += 1
+        kept_metadata = self.kept[canonical]["metadata"]
+        ref = source_ref(chunk["metadata"])
+        if ref not in kept_metadata["sources"].split("; "):
+            kept_metadata["sources"] += f"; {ref}"
+        return False
+
+    def merged_chunks(self):
+        """Kept chunks that absorbed at least one duplicate from another page."""
+        return [chunk for chunk in self.kept.values() if "; " in chunk["metadata"]["sources"]]
+
+    def stats(self):
+        return {
+            "chunks_seen": self.seen,
+            "chunks_stored": self.seen - self.collapsed,
+            "embedding_calls_saved": self.collapsed,
+            "index_rows_saved": self.collapsed,
+        }
+
+
+def collapse_near_duplicates(chunks, threshold=SIMILARITY_THRESHOLD):
+    """
+    Returns (unique_chunks, stats) for a list of {"text", "metadata"} chunks,
+    collapsing near-duplicates within each source.
+    """
+    deduplicator = ChunkDeduplicator(threshold)
+    unique_chunks = [chunk for chunk in chunks if deduplicator.add(chunk)]
+    stats = deduplicator.stats()
+    print(f"Near-duplicate removal: {stats['chunks_seen']} chunks -> {stats['chunks_stored']} "
+          f"({stats['embedding_calls_saved']} embedding calls saved)")
+    return unique_chunks, stats
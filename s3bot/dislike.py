@@ -8,6 +8,7 @@ import chromadb
 from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
 from atlassian import Jira, Confluence
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from embeddings import shared_titan_embedding
 
 # AWS Bedrock client
 brt = boto3.client(service_name="bedrock-runtime", region_name="us-east-1")
@@ -49,13 +50,13 @@ st.set_page_config(page_title="Ask SRE Infra Assist", page_icon="🛠️", layou
 # Initialize ChromaDB Collection
 if "collection" not in st.session_state:
     with st.spinner("Loading FannieAstra..."):
-        embedding_function = TitanEmbeddingFunction(model_id="amazon.titan-embed-text-v2:0")
+        embedding_function = shared_titan_embedding("amazon.titan-embed-text-v2:0")
         client = chromadb.PersistentClient(path="./knowledge_base")
         collection = client.get_or_create_collection(name="my_collection", embedding_function=embedding_function)
         st.session_state.collection = store_all_pdfs_in_chromadb(PDF_PATH, embedding_function)
 
 # Chatbot Section
-embedding_function = TitanEmbeddingFunction(model_id="amazon.titan-embed-text-v2:0")
+embedding_function = shared_titan_embedding("amazon.titan-embed-text-v2:0")
 
 st.header("Chatbot Interface")
 
@@ -71,7 +72,7 @@ if submit_button and user_query:
         model_id = "anthropic.claude-3-5-sonnet-20240620-v1:0"
         response, confluence_links, other_pdf_sources = query_chromadb_and_generate_response(
             user_query,
-            TitanEmbeddingFunction(model_id="amazon.titan-embed-text-v2:0"),
+            shared_titan_embedding("amazon.titan-embed-text-v2:0"),
             st.session_state.collection,
             model_id,
         )
@@ -0,0 +1,186 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+EMBEDDING_CACHE_PATH = "./embedding_cache.sqlite3"
+EMBEDDING_CACHE_MAX_BYTES = 1024 * 1024 * 1024  # 1 GB of vectors, ~250k Titan v2 embeddings at 1024 dims
+LRU_SIZE = 2048  # query embeddings kept in process memory
+_SQL_BATCH = 500  # keys per SELECT, below SQLite's bound-parameter limit
+
+
+def cache_key(model_id, dimensions, normalize, text, dtype="float32"):
+    """(model, output dimensions, normalize flag, storage dtype, SHA-256 of the text) as one string key."""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{model_id}|{dimensions}|{normalize}|{dtype}|{digest}"
+
+
+class EmbeddingCache:
+    """
+    On-disk cache of embedding vectors keyed by cache_key.
+
+    Vectors are stored as dtype blobs: float32, or float16 to halve the size
+    at a small recall cost (see bench_embeddings.py). The dtype is part of
+    every key, so caches of either precision can share one file. Entries are
+    evicted least-recently-used first once the stored vectors exceed
+    max_bytes. SQLite in WAL mode handles locking, so the Streamlit apps and
+    ingestion jobs on one host share a single cache file.
+    """
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, max_bytes=EMBEDDING_CACHE_MAX_BYTES, dtype="float32"):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY,"
+                " vector BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+        # Running estimate of the stored bytes; the exact sum is only computed when it crosses max_bytes
+        self._total = self._stored_bytes()
+
+    def _stored_bytes(self):
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    def get_many(self, keys):
+        """Returns {key: vector} for the keys that are cached."""
+        found = {}
+        with self._lock, self._conn:
+            for start in range(0, len(keys), _SQL_BATCH):
+                batch = keys[start:start + _SQL_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                found.update((key, np.frombuffer(vector, dtype=self.dtype).astype(np.float32).tolist())
+                             for key, vector in rows)
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?",
+                                       [(now, key) for key in found])
+        return found
+
+    def put_many(self, items):
+        """Stores [(key, vector), ...] in one transaction."""
+        now = time.time()
+        rows = []
+        for key, vector in items:
+            blob = np.asarray(vector, dtype=self.dtype).tobytes()
+            rows.append((key, blob, len(blob), now))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, size, last_access) VALUES (?, ?, ?, ?)", rows
+            )
+            self._total += sum(row[2] for row in rows)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        total = self._stored_bytes()
+        # Evict down to 90% so the scan below is not repeated on every put
+        target = self.max_bytes * 0.9
+        if total > self.max_bytes:
+            rows = self._conn.execute("SELECT key, size FROM embeddings ORDER BY last_access").fetchall()
+            for key, size in rows:
+                if total <= target:
+                    break
+                self._conn.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+                total -= size
+        self._total = total
+
+    def close(self):
+        self._conn.close()
+
+
+class LruCache:
+    """Small thread-safe in-memory LRU mapping."""
+
+    def __init__(self, maxsize=LRU_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class CachedEmbedder:
+    """
+    Serves embeddings from an LRU (single-text calls, i.e. queries), then the
+    shared EmbeddingCache, and only sends the remaining texts to embed_fn.
+    Batch calls from ingestion skip the LRU so they do not evict hot queries.
+    """
+
+    def __init__(self, cache=None, lru_size=LRU_SIZE):
+        self.cache = cache or EmbeddingCache()
+        self.lru = LruCache(lru_size)
+        self.stats = {"lru_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def embed(self, texts, embed_fn, model_id, dimensions=None, normalize=None):
+        keys = [cache_key(model_id, dimensions, normalize, text, self.cache.dtype.name) for text in texts]
+        vectors = [None] * len(texts)
+
+        use_lru = len(texts) == 1
+        if use_lru:
+            vectors[0] = self.lru.get(keys[0])
+            if vectors[0] is not None:
+                self.stats["lru_hits"] += 1
+                return vectors
+
+        cached = self.cache.get_many(list(set(keys)))
+        self.stats["disk_hits"] += sum(key in cached for key in keys)
+        missing = {}  # key -> first index, so duplicate texts in one call are embedded once
+        for idx, key in enumerate(keys):
+            if key in cached:
+                vectors[idx] = cached[key]
+            else:
+                missing.setdefault(key, idx)
+
+        if missing:
+            self.stats["misses"] += len(missing)
+            fresh = embed_fn([texts[idx] for idx in missing.values()])
+            if self.cache.dtype != np.float32:
+                # Round fresh vectors like cached ones, so a text's embedding does not depend on cache hits
+                fresh = np.asarray(fresh, dtype=self.cache.dtype).astype(np.float32).tolist()
+            fresh_by_key = dict(zip(missing, fresh))
+            self.cache.put_many(list(fresh_by_key.items()))
+            for idx, key in enumerate(keys):
+                if vectors[idx] is None:
+                    vectors[idx] = fresh_by_key[key]
+
+        if use_lru:
+            self.lru.put(keys[0], vectors[0])
+        return vectors
+
+
+_shared_embedders = {}
+_shared_lock = threading.Lock()
+
+
+def shared_embedder(dtype="float32"):
+    """The process-wide CachedEmbedder for vectors stored as dtype, created on first use."""
+    with _shared_lock:
+        if dtype not in _shared_embedders:
+            _shared_embedders[dtype] = CachedEmbedder(EmbeddingCache(dtype=dtype))
+        return _shared_embedders[dtype]
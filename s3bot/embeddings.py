@@ -0,0 +1,314 @@
+import functools
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError
+
+from embedding_cache import shared_embedder
+from rate_limiter import BACKGROUND, INTERACTIVE, bedrock_limiter
+from singleflight import get_group, request_key
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # optional local CPU backend
+    SentenceTransformer = None
+
+MAX_WORKERS = 32  # upper bound on concurrent invoke_model calls
+INITIAL_CONCURRENCY = 4
+MAX_RETRIES = 6
+THROTTLE_CODES = {"ThrottlingException", "TooManyRequestsException"}
+# Server-side failures worth another attempt; anything else (validation, access) is raised at once
+TRANSIENT_CODES = {"ServiceUnavailableException", "InternalServerException", "ModelNotReadyException",
+                   "ModelTimeoutException"}
+TITAN_V2_DIMENSIONS = (256, 512, 1024)
+LOCAL_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+LOCAL_BATCH_SIZE = 64
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit: every success raises the limit by 1/limit (about
+    +1 per round of calls), a throttle halves it.
+
+    acquire() returns the current generation, which changes on every decrease.
+    A throttle only halves the limit if its call started after the last
+    decrease, so a burst of throttles from calls that were already in flight
+    counts once.
+    """
+
+    def __init__(self, initial=INITIAL_CONCURRENCY, minimum=1, maximum=MAX_WORKERS):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.generation = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+            return self.generation
+
+    def release(self, generation, throttled=False, failed=False):
+        """Ends a call; only a success raises the limit, only a throttle lowers it."""
+        with self._cond:
+            self.in_flight -= 1
+            if not throttled and not failed:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            elif throttled and generation == self.generation:
+                self.limit = max(self.minimum, self.limit / 2)
+                self.generation += 1
+            self._cond.notify_all()
+
+
+def is_throttle(error):
+    return isinstance(error, ClientError) and error.response.get("Error", {}).get("Code") in THROTTLE_CODES
+
+
+def is_transient(error):
+    """True for throttles, Bedrock server-side errors and dropped connections."""
+    if isinstance(error, BotoConnectionError):
+        return True
+    return isinstance(error, ClientError) and error.response.get("Error", {}).get("Code") in THROTTLE_CODES | TRANSIENT_CODES
+
+
+class EmbeddingBackend:
+    """
+    Common interface for the embedding backends, usable as a ChromaDB embedding function.
+
+    Subclasses set name, model_id, dimensions and normalize and implement
+    embed_uncached(texts, lane). embed() serves repeated texts from the
+    shared embedding cache; model_id is part of every cache key, so backends
+    never see each other's vectors.
+
+    Callers state the rate-limit lane by the method they use: embed_query()
+    for a user question (interactive lane, identical concurrent questions
+    share one call), embed() for ingestion (background lane). __call__ is
+    what ChromaDB invokes for add(documents=...), so it embeds in the
+    background lane too.
+    """
+
+    name = None
+    embedder = None
+    dimensions = None
+    normalize = None
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def embed_uncached(self, texts, lane=BACKGROUND):
+        raise NotImplementedError
+
+    def embed(self, texts, lane=BACKGROUND):
+        embed_uncached = functools.partial(self.embed_uncached, lane=lane)
+        if self.embedder is None:
+            return embed_uncached(texts)
+        return self.embedder.embed(list(texts), embed_uncached, self.model_id, self.dimensions, self.normalize)
+
+    def embed_query(self, text):
+        """The embedding of one user question; sessions asking the same question at the same time share one call."""
+        key = request_key(self.model_id, self.dimensions, self.normalize, text)
+        return get_group("query_embedding").do(key, self.embed, [text], INTERACTIVE)[0]
+
+    def __call__(self, input):
+        return self.embed(input)
+
+
+class TitanEmbeddingFunction(EmbeddingBackend):
+    """
+    ChromaDB embedding function for Bedrock Titan that embeds the texts of a
+    call concurrently on a thread pool.
+
+    The number of calls in flight adapts to Bedrock's quota through
+    AdaptiveLimiter. A throttled or transiently failed text is retried on its
+    own with jittered exponential backoff; the rest of the input is not
+    resent. Other errors (validation, access denied) are raised at once.
+    Embeddings are returned in input order.
+
+    dimensions (256, 512 or 1024) and normalize are Titan v2 request options;
+    left as None, the model defaults apply (1024 dimensions, normalized).
+    precision="float16" stores cached vectors at half precision. ChromaDB
+    always keeps float32, so it only shrinks the cache and float16-capable indexes.
+
+    With cache=True (the default) texts embedded before, by any process on
+    this host, are served from the shared embedding cache; pass a
+    CachedEmbedder to use a different one, or False to always call Bedrock.
+
+    Every call first takes a token from the host-wide Bedrock rate limiter,
+    in the lane the caller asked for (see EmbeddingBackend).
+
+    The limiter and thread pool belong to the instance, so apps should use
+    shared_titan_embedding() instead of creating one per request.
+    """
+
+    name = "titan"
+
+    def __init__(self, model_id, region="us-east-1", max_workers=MAX_WORKERS,
+                 initial_concurrency=INITIAL_CONCURRENCY, max_retries=MAX_RETRIES, cache=True,
+                 dimensions=None, normalize=None, precision="float32", rate_limiter=True):
+        if dimensions is not None and dimensions not in TITAN_V2_DIMENSIONS:
+            raise ValueError(f"dimensions must be one of {TITAN_V2_DIMENSIONS}, got {dimensions}")
+        self.model_id = model_id
+        self.dimensions = dimensions
+        self.normalize = normalize
+        self.precision = precision
+        self.rate_limiter = bedrock_limiter() if rate_limiter is True else rate_limiter or None
+        self.embedder = shared_embedder(precision) if cache is True else cache or None
+        self.max_retries = max_retries
+        # botocore's own retries would hide throttling from the limiter, so they are off
+        self.bedrock_runtime = boto3.client(
+            "bedrock-runtime",
+            region_name=region,
+            config=Config(max_pool_connections=max_workers, retries={"max_attempts": 1, "mode": "standard"}),
+        )
+        self.limiter = AdaptiveLimiter(initial_concurrency, maximum=max_workers)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="titan-embed")
+        self.stats = {"calls": 0, "throttles": 0, "retries": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def request_body(self, text):
+        body = {"inputText": text}
+        if self.dimensions is not None:
+            body["dimensions"] = self.dimensions
+        if self.normalize is not None:
+            body["normalize"] = self.normalize
+        return json.dumps(body)
+
+    def _invoke(self, text):
+        response = self.bedrock_runtime.invoke_model(
+            modelId=self.model_id,
+            contentType="application/json",
+            accept="application/json",
+            body=self.request_body(text)
+        )
+        return json.loads(response["body"].read())["embedding"]
+
+    def embed_one(self, text, lane=BACKGROUND):
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(lane)
+            generation = self.limiter.acquire()
+            throttled = failed = False
+            try:
+                self._count("calls")
+                return self._invoke(text)
+            except Exception as e:
+                failed = True
+                throttled = is_throttle(e)
+                if throttled:
+                    self._count("throttles")
+                if attempt == self.max_retries or not is_transient(e):
+                    raise
+                self._count("retries")
+            finally:
+                self.limiter.release(generation, throttled, failed)
+            time.sleep(min(20, 0.25 * 2 ** attempt) * random.uniform(0.5, 1.5))
+
+    def embed_uncached(self, texts, lane=BACKGROUND):
+        if len(texts) == 1:
+            return [self.embed_one(texts[0], lane)]
+        return list(self.executor.map(self.embed_one, texts, [lane] * len(texts)))
+
+
+class LocalEmbeddingFunction(EmbeddingBackend):
+    """
+    CPU embedding backend built on sentence-transformers, for bulk re-indexing
+    and offline benchmarks without Bedrock round trips.
+
+    Texts are encoded in batches of batch_size; threads caps the torch/ONNX
+    intra-op threads (default: all cores). backend="onnx" runs the exported
+    ONNX graph through onnxruntime, which is usually faster on CPU than torch.
+    Its vectors live in a different space than Titan's, so a collection must
+    be built and queried with the same backend (see open_collection).
+    """
+
+    name = "local"
+
+    @classmethod
+    def available(cls):
+        return SentenceTransformer is not None
+
+    def __init__(self, model_name=LOCAL_MODEL, batch_size=LOCAL_BATCH_SIZE, threads=None, backend="torch",
+                 normalize=True, cache=True, precision="float32"):
+        if not self.available():
+            raise RuntimeError("The local embedding backend needs sentence-transformers (pip install sentence-transformers)")
+        if threads is not None:
+            import torch
+            torch.set_num_threads(threads)
+        self.model_name = model_name
+        self.model_id = f"local:{model_name}:{backend}"
+        self.batch_size = batch_size
+        self.normalize = normalize
+        self.model = SentenceTransformer(model_name, device="cpu", backend=backend)
+        self.dimensions = self.model.get_sentence_embedding_dimension()
+        self.embedder = shared_embedder(precision) if cache is True else cache or None
+
+    def embed_uncached(self, texts, lane=BACKGROUND):
+        # Local encoding uses no Bedrock quota, so the lane does not matter
+        vectors = self.model.encode(list(texts), batch_size=self.batch_size, normalize_embeddings=self.normalize,
+                                    convert_to_numpy=True, show_progress_bar=False)
+        return vectors.tolist()
+
+
+_shared_titan = {}
+_shared_titan_lock = threading.Lock()
+
+
+def shared_titan_embedding(model_id="amazon.titan-embed-text-v2:0", region="us-east-1"):
+    """The process-wide TitanEmbeddingFunction for model_id and region, created on first use."""
+    with _shared_titan_lock:
+        if (model_id, region) not in _shared_titan:
+            _shared_titan[model_id, region] = TitanEmbeddingFunction(model_id=model_id, region=region)
+        return _shared_titan[model_id, region]
+
+
+EMBEDDING_BACKENDS = {"titan": TitanEmbeddingFunction, "local": LocalEmbeddingFunction}
+
+
+def get_embedding_function(backend="titan", **options):
+    """Creates the named embedding backend; options go to its constructor."""
+    if backend not in EMBEDDING_BACKENDS or not EMBEDDING_BACKENDS[backend].available():
+        raise ValueError(f"Unknown or unavailable embedding backend: {backend}")
+    if backend == "titan":
+        options.setdefault("model_id", "amazon.titan-embed-text-v2:0")
+    return EMBEDDING_BACKENDS[backend](**options)
+
+
+def open_collection(client, name, backend=None, **options):
+    """
+    Gets or creates a ChromaDB collection together with the embedding backend it was built with.
+
+    The backend name and options are recorded in the collection metadata when
+    the collection is created, and reused on every later open, so queries are
+    always embedded like the stored chunks. backend=None opens an existing
+    collection with its recorded backend, or creates a Titan one.
+
+    Returns:
+        tuple: (collection, embedding_function)
+    """
+    existing = {c if isinstance(c, str) else c.name for c in client.list_collections()}
+    if name in existing:
+        metadata = client.get_collection(name).metadata or {}
+        recorded = metadata.get("embedding_backend", "titan")
+        if backend is not None and backend != recorded:
+            raise ValueError(f"Collection {name} was built with the {recorded} embedding backend, not {backend}")
+        options = {**json.loads(metadata.get("embedding_options", "{}")), **options}
+        embedding_function = get_embedding_function(recorded, **options)
+        return client.get_collection(name, embedding_function=embedding_function), embedding_function
+
+    backend = backend or "titan"
+    embedding_function = get_embedding_function(backend, **options)
+    metadata = {"embedding_backend": backend, "embedding_options": json.dumps(options)}
+    return client.create_collection(name, embedding_function=embedding_function, metadata=metadata), embedding_function
@@ -22,9 +22,10 @@ def extract_hyperlinks_from_pdf(pdf_dir):
 
     return list(urls)
 
-# Call the function with the correct directory path
-pdf_directory = "pdf_dir"  # Change this to the actual path if needed
-extracted_urls = extract_hyperlinks_from_pdf(pdf_directory)
+if __name__ == "__main__":
+    # Call the function with the correct directory path
+    pdf_directory = "pdf_dir"  # Change this to the actual path if needed
+    extracted_urls = extract_hyperlinks_from_pdf(pdf_directory)
 
-# Print extracted URLs
-print(extracted_urls)
+    # Print extracted URLs
+    print(extracted_urls)
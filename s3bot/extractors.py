@@ -0,0 +1,242 @@
+import os
+import re
+import statistics
+import sys
+import time
+
+import pdfplumber
+from PyPDF2 import PdfReader
+
+from memory_guard import release_page
+
+try:
+    import pypdfium2
+except ImportError:  # optional fast path
+    pypdfium2 = None
+
+SAMPLE_PAGES = 5
+BENCHMARK_REPEATS = 3  # timed rounds per backend, in rotated order
+MIN_QUALITY = 0.9  # share of the best backend's word count a faster backend must reach
+
+_WORD_RE = re.compile(r"[A-Za-z0-9]{2,}")
+
+
+class PdfExtractor:
+    """
+    Common interface for the PDF text backends.
+
+    open/close handle a backend document, so callers that read one file
+    several times (the benchmark) pay the open cost once. extract_open
+    yields (page_number, text) from an open document and extract_pages from
+    a path, with 1-based page numbers, for all pages or only for
+    page_numbers when given.
+    """
+
+    name = None
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def open(self, pdf_path):
+        raise NotImplementedError
+
+    def close(self, document):
+        pass
+
+    def document_page_count(self, document):
+        raise NotImplementedError
+
+    def extract_open(self, document, page_numbers=None):
+        raise NotImplementedError
+
+    def page_count(self, pdf_path):
+        document = self.open(pdf_path)
+        try:
+            return self.document_page_count(document)
+        finally:
+            self.close(document)
+
+    def extract_pages(self, pdf_path, page_numbers=None):
+        document = self.open(pdf_path)
+        try:
+            yield from self.extract_open(document, page_numbers)
+        finally:
+            self.close(document)
+
+
+class PyPDF2Extractor(PdfExtractor):
+    name = "pypdf2"
+
+    def open(self, pdf_path):
+        return PdfReader(pdf_path)
+
+    def document_page_count(self, document):
+        return len(document.pages)
+
+    def extract_open(self, document, page_numbers=None):
+        for page_num in page_numbers or range(1, len(document.pages) + 1):
+            yield page_num, document.pages[page_num - 1].extract_text() or ""
+
+
+class PdfplumberExtractor(PdfExtractor):
+    name = "pdfplumber"
+
+    def open(self, pdf_path):
+        return pdfplumber.open(pdf_path)
+
+    def close(self, document):
+        document.close()
+
+    def document_page_count(self, document):
+        return len(document.pages)
+
+    def extract_open(self, document, page_numbers=None):
+        for page_num in page_numbers or range(1, len(document.pages) + 1):
+            page = document.pages[page_num - 1]
+            text = page.extract_text() or ""
+            release_page(page, document)
+            yield page_num, text
+
+
+class PdfiumExtractor(PdfExtractor):
+    name = "pdfium"
+
+    @classmethod
+    def available(cls):
+        return pypdfium2 is not None
+
+    def open(self, pdf_path):
+        return pypdfium2.PdfDocument(pdf_path)
+
+    def close(self, document):
+        document.close()
+
+    def document_page_count(self, document):
+        return len(document)
+
+    def extract_open(self, document, page_numbers=None):
+        for page_num in page_numbers or range(1, len(document) + 1):
+            page = document[page_num - 1]
+            textpage = page.get_textpage()
+            text = textpage.get_text_range()
+            textpage.close()
+            page.close()
+            yield page_num, text.replace("\r\n", "\n")
+
+
+EXTRACTORS = {cls.name: cls for cls in (PdfiumExtractor, PyPDF2Extractor, PdfplumberExtractor)}
+
+
+def available_extractors():
+    return [cls() for cls in EXTRACTORS.values() if cls.available()]
+
+
+def get_extractor(name):
+    if name not in EXTRACTORS or not EXTRACTORS[name].available():
+        raise ValueError(f"Unknown or unavailable PDF extractor: {name}")
+    return EXTRACTORS[name]()
+
+
+def text_quality(text):
+    """Number of word-like tokens; garbled or missing text scores low."""
+    return len(_WORD_RE.findall(text))
+
+
+def sample_page_numbers(total_pages, sample_pages=SAMPLE_PAGES):
+    """Evenly spaced 1-based page numbers covering the document."""
+    if total_pages <= sample_pages:
+        return list(range(1, total_pages + 1))
+    step = total_pages / sample_pages
+    return sorted({int(i * step) + 1 for i in range(sample_pages)})
+
+
+def benchmark_extractors(pdf_path, sample_pages=SAMPLE_PAGES, repeats=BENCHMARK_REPEATS):
+    """
+    Times every available backend on the same sample of pages.
+
+    The file is read once up front so no backend pays the cold disk read,
+    and every backend opens the document outside the timed region. An
+    untimed warm-up pass measures text quality; the timed rounds then rotate
+    the backend order, and each backend's median round is reported.
+
+    Returns:
+        list: {"name", "seconds", "words"} dicts, one per backend that did not fail.
+    """
+    with open(pdf_path, "rb") as f:
+        while f.read(1024 * 1024):
+            pass
+
+    documents = {}
+    words = {}
+    try:
+        for extractor in available_extractors():
+            try:
+                documents[extractor.name] = (extractor, extractor.open(pdf_path))
+            except Exception as e:
+                print(f"Extractor {extractor.name} failed on {pdf_path}: {e}")
+        if not documents:
+            return []
+        extractor, document = next(iter(documents.values()))
+        pages = sample_page_numbers(extractor.document_page_count(document), sample_pages)
+
+        for name, (extractor, document) in list(documents.items()):
+            try:
+                words[name] = sum(text_quality(text) for _, text in extractor.extract_open(document, pages))
+            except Exception as e:
+                print(f"Extractor {name} failed on {pdf_path}: {e}")
+                extractor.close(document)
+                del documents[name]
+
+        names = list(documents)
+        timings = {name: [] for name in names}
+        for round_num in range(repeats):
+            shift = round_num % len(names) if names else 0
+            for name in names[shift:] + names[:shift]:
+                extractor, document = documents[name]
+                start = time.perf_counter()
+                for _ in extractor.extract_open(document, pages):
+                    pass
+                timings[name].append(time.perf_counter() - start)
+    finally:
+        for extractor, document in documents.values():
+            extractor.close(document)
+
+    return [{"name": name, "seconds": statistics.median(timings[name]), "words": words[name]} for name in names]
+
+
+def select_extractor(pdf_path, sample_pages=SAMPLE_PAGES, min_quality=MIN_QUALITY):
+    """
+    Picks the fastest backend whose sampled text keeps at least min_quality
+    of the best backend's word count. Falls back to pdfplumber.
+    """
+    results = benchmark_extractors(pdf_path, sample_pages)
+    if not results:
+        return PdfplumberExtractor()
+    best_words = max(result["words"] for result in results)
+    good_enough = [r for r in results if best_words == 0 or r["words"] >= best_words * min_quality]
+    fastest = min(good_enough, key=lambda r: r["seconds"])
+    return get_extractor(fastest["name"])
+
+
+def extract_document(pdf_path, extractor="auto"):
+    """
+    Extracts every page of pdf_path.
+
+    Args:
+        pdf_path (str): PDF to read.
+        extractor (str): Backend name, or "auto" to benchmark and pick one.
+
+    Returns:
+        tuple: (backend name, [(page_number, text), ...])
+    """
+    backend = select_extractor(pdf_path) if extractor == "auto" else get_extractor(extractor)
+    return backend.name, list(backend.extract_pages(pdf_path))
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        print(f"{os.path.basename(path)}:")
+        for result in benchmark_extractors(path):
+            print(f"  {result['name']:<12} {result['seconds'] * 1000:8.1f} ms  {result['words']:>7} words")
+        print(f"  selected: {select_extractor(path).name}")
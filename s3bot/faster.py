@@ -3,76 +3,102 @@ import json
 import re
 import numpy as np
 import boto3
-import redis
 import pdfplumber
 import requests
 import streamlit as st
 from PyPDF2 import PdfReader
 from concurrent.futures import ThreadPoolExecutor
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from bulk_writer import BulkWriter
+from chunk_ids import make_chunk_id, new_chunk_indexes
+from chunker import CHUNK_OVERLAP, CHUNK_SIZE
+from pipeline import read_and_chunk_document
 from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from page_cache import PageTextCache, extract_pages_cached, file_sha256
+from boilerplate import strip_boilerplate
+from manifest import EMBEDDED, IngestManifest, source_state
+from numpy_index import open_vector_store
+from embeddings import shared_titan_embedding
+from rate_limiter import INTERACTIVE, rate_limited
+from singleflight import singleflight
 
 # AWS Bedrock client
 brt = boto3.client(service_name="bedrock-runtime", region_name="us-east-1")
 
-# Redis Cache for Storing Extracted PDF Text
-cache = redis.StrictRedis(host="localhost", port=6379, db=0)
+# On-disk cache of extracted page text, keyed by file content hash + page
+page_cache = PageTextCache()
 
 # Path Constants
 PDF_PATH = "./s3-api.pdf"
-PROCESSED_PDFS_FILE = "./processed_pdfs.json"
+# Page-level ingestion progress, shared safely by the ThreadPoolExecutor workers below
+manifest = IngestManifest()
 
 # Base URLs
 JIRA_BASE_URL = "https://8443/browse/"
 CONFLUENCE_BASE_URL = "https://confluence.url/pages/viewpage.action?pageId="
 
-# Load Processed PDFs
-def load_processed_pdfs():
-    if os.path.exists(PROCESSED_PDFS_FILE):
-        with open(PROCESSED_PDFS_FILE, "r") as f:
-            return json.load(f)
-    return {}
-
-def save_processed_pdfs(processed_pdfs):
-    with open(PROCESSED_PDFS_FILE, "w") as f:
-        json.dump(processed_pdfs, f)
-
-# Extract Text from PDFs (Faster with pdfplumber)
+# Extract Text from PDFs (selected extraction backend, unchanged pages served from cache)
 def extract_text_from_pdf(pdf_path):
-    cached_text = cache.get(pdf_path)
-    if cached_text:
-        return cached_text.decode("utf-8")  # Retrieve from cache
-
-    with pdfplumber.open(pdf_path) as pdf:
-        extracted_text = "\n".join(page.extract_text() for page in pdf.pages if page.extract_text())
-
-    cache.set(pdf_path, extracted_text)  # Store in cache
-    return extracted_text
-
-# Read and Chunk PDF (Optimized for Speed)
-def read_and_chunk_pdf(pdf_path, chunk_size=500, chunk_overlap=50):
-    text = extract_text_from_pdf(pdf_path)
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    return text_splitter.create_documents([text])
+    pages = extract_pages_cached(pdf_path, page_cache)
+    page_texts, boilerplate = strip_boilerplate([text for _, text in pages])
+    boilerplate.print_report(pdf_path)
+    return "\n".join(text for text in page_texts if text)
+
+# Read and Chunk PDF (Optimized for Speed, page spans kept for citations)
+def read_and_chunk_pdf(pdf_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    pages = extract_pages_cached(pdf_path, page_cache)
+    # The cached pages go through the same boilerplate stripping and chunking as every other ingest path
+    extractor = page_cache.file_extractor(file_sha256(pdf_path))
+    return read_and_chunk_document(pdf_path, chunk_size, chunk_overlap, extractor=extractor, page_texts=pages)
 
 # Store PDF Embeddings (Parallel Processing)
-def process_pdf(pdf_path, embedding_function):
-    pdf_file = os.path.basename(pdf_path)
-    processed_pdfs = load_processed_pdfs()
-
-    if pdf_file in processed_pdfs:
-        print(f"Skipping already processed PDF: {pdf_file}")
+def process_pdf(pdf_path, embedding_function, collection, batch_size=10, chunk_size=CHUNK_SIZE,
+                chunk_overlap=CHUNK_OVERLAP):
+    """
+    Chunks and embeds one PDF. The manifest skips finished files and resumes
+    interrupted ones after the last embedded page: a page is marked embedded
+    once every chunk that touches it is stored.
+    """
+    model_id = getattr(embedding_function, "model_id", type(embedding_function).__name__)
+    file_hash, version = source_state(pdf_path, model_id, chunk_size, chunk_overlap)
+    if manifest.is_done(pdf_path, file_hash, version):
+        print(f"Skipping already processed PDF: {os.path.basename(pdf_path)}")
         return
-
-    print(f"Processing new PDF: {pdf_file}")
-    process_large_pdf(pdf_path, batch_size=10)
-    processed_pdfs[pdf_file] = True
-    save_processed_pdfs(processed_pdfs)
+    done_pages = manifest.start_file(pdf_path, file_hash, version)
+    print(f"Processing PDF: {os.path.basename(pdf_path)}"
+          + (f" (resuming, {len(done_pages)} pages already embedded)" if done_pages else ""))
+
+    chunks = [chunk for chunk in read_and_chunk_pdf(pdf_path, chunk_size, chunk_overlap)
+              if not set(range(chunk.metadata["page_start"], chunk.metadata["page_end"] + 1)) <= done_pages]
+    marked = max(done_pages, default=0)
+    writer = BulkWriter(collection, embedding_function)
+    for start in range(0, len(chunks), batch_size):
+        batch = chunks[start:start + batch_size]
+        ids = [make_chunk_id(chunk.metadata["source"], chunk.metadata["page"], chunk.page_content) for chunk in batch]
+        new_indexes = new_chunk_indexes(collection, ids)
+        writer.add_many([ids[i] for i in new_indexes], [batch[i].page_content for i in new_indexes],
+                        [batch[i].metadata for i in new_indexes])
+        writer.flush()
+        # Pages before the next chunk's first page have all their chunks stored
+        complete_to = chunks[start + batch_size].metadata["page_start"] - 1 if start + batch_size < len(chunks) \
+            else max(chunk.metadata["page_end"] for chunk in chunks)
+        if complete_to > marked:
+            manifest.mark_pages(pdf_path, range(marked + 1, complete_to + 1), EMBEDDED)
+            marked = complete_to
+    writer.report()
+    manifest.finish_file(pdf_path)
 
 def store_all_pdfs_in_chromadb(pdf_dir, embedding_function):
+    collection = open_vector_store(embedding_function)
     pdf_files = [os.path.join(pdf_dir, f) for f in os.listdir(pdf_dir) if f.endswith(".pdf")]
+
+    def process(pdf_path):
+        try:
+            process_pdf(pdf_path, embedding_function, collection)
+        except Exception as e:
+            print(f"Error processing PDF {pdf_path}: {str(e)}")
+
     with ThreadPoolExecutor() as executor:
-        executor.map(lambda pdf: process_pdf(pdf, embedding_function), pdf_files)
+        list(executor.map(process, pdf_files))
     return collection
 
 # Extract Jira Keys from Bedrock Response
@@ -90,7 +116,7 @@ def fetch_multiple(urls):
 
 # Query ChromaDB & Generate Response
 def query_chromadb_and_generate_response(user_query, embedding_function, collection, model_id, region="us-east-1"):
-    query_embedding = embedding_function([user_query])[0]
+    query_embedding = embedding_function.embed_query(user_query)
     results = collection.query(query_embedding, n_results=2)  # Reduced from 5 to 2
 
     if not results or "documents" not in results or not results["documents"]:
@@ -124,6 +150,8 @@ def query_chromadb_and_generate_response(user_query, embedding_function, collect
     return response, confluence_links, jira_links, other_pdf_sources
 
 # Bedrock API with Streaming
+@singleflight("bedrock_answer")
+@rate_limited(INTERACTIVE)
 def generate_answer_with_bedrock(prompt, model_id, region="us-east-1"):
     client = boto3.client("bedrock-runtime", region_name=region)
     conversation_history = st.session_state.get("conversation", [])[-2:]  # Last 2 exchanges
@@ -172,7 +200,7 @@ if submit_button and user_query:
     with st.spinner("Generating response..."):
         model_id = "anthropic.claude-3-5-sonnet-20240620-v1:0"
         response, confluence_links, jira_links, other_pdf_sources = query_chromadb_and_generate_response(
-            user_query, TitanEmbeddingFunction(model_id="amazon.titan-embed-text-v2:0"), st.session_state.collection, model_id
+            user_query, shared_titan_embedding("amazon.titan-embed-text-v2:0"), st.session_state.collection, model_id
         )
 
         references = "\n\n🔗 References:\n" + "\n".join(jira_links + confluence_links + list(other_pdf_sources))
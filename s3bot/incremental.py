@@ -0,0 +1,91 @@
+import json
+
+from bulk_writer import write_chunks
+from chunk_ids import source_name
+from chunker import CHUNK_OVERLAP, CHUNK_SIZE
+from pipeline import chunk_document_pages, iter_document_pages, page_fingerprint
+
+
+def indexed_page_state(collection, source):
+    """
+    Reads what is already indexed for source.
+
+    Returns:
+        tuple: (set of chunk ids, {page number: page_hash}, extractor name or None).
+            Page hashes come from the page_hashes metadata that every chunk gets
+            from pipeline.CrossPageChunker; chunks stored before that have none.
+    """
+    existing = collection.get(where={"source": source}, include=["metadatas"])
+    page_hashes = {}
+    extractor = None
+    for metadata in existing["metadatas"]:
+        metadata = metadata or {}
+        page_hashes.update({int(page): page_hash
+                            for page, page_hash in json.loads(metadata.get("page_hashes", "{}")).items()})
+        extractor = extractor or metadata.get("extractor")
+    return set(existing["ids"]), page_hashes, extractor
+
+
+def diff_pages(current_hashes, indexed_hashes):
+    """
+    Compares page fingerprints with the indexed ones.
+
+    Returns:
+        tuple: (changed pages, removed pages), both sorted. New pages count as changed.
+    """
+    changed = sorted(page for page, page_hash in current_hashes.items() if indexed_hashes.get(page) != page_hash)
+    removed = sorted(page for page in indexed_hashes if page not in current_hashes)
+    return changed, removed
+
+
+def reingest_changed_pages(pdf_path, embedding_function, collection, chunk_size=CHUNK_SIZE,
+                           chunk_overlap=CHUNK_OVERLAP):
+    """
+    Re-embeds only the chunks of pdf_path whose text changed since it was indexed.
+
+    Every page is fingerprinted from the text the full ingest would see (same
+    extractor, boilerplate stripping). If no page changed, nothing else
+    happens. Otherwise the document is re-chunked across page breaks; chunk
+    ids are content-derived, so chunks on untouched pages keep their ids and
+    cost no embedding call. New chunks are embedded and upserted first, and
+    chunks that are no longer produced (edited or removed pages) are deleted
+    only after that succeeded, so a failed embedding never leaves a page
+    missing from the index.
+
+    Returns:
+        dict: Counts of changed, removed and unchanged pages and of embedded and deleted chunks.
+    """
+    indexed_ids, indexed_hashes, extractor = indexed_page_state(collection, source_name(pdf_path))
+    # Reuse the recorded extractor: another backend would produce different text, and so different ids
+    pages = list(iter_document_pages(pdf_path, extractor=extractor))
+    current_hashes = {page_num: page_fingerprint(text) for _, page_num, text, _ in pages}
+    changed, removed = diff_pages(current_hashes, indexed_hashes)
+    unchanged = len(current_hashes) - len(changed)
+    result = {"changed": len(changed), "removed": len(removed), "unchanged": unchanged, "embedded": 0, "deleted": 0}
+    if not changed and not removed:
+        print(f"{pdf_path}: unchanged ({unchanged} pages)")
+        return result
+
+    # Chunks carry the current page_hashes of the pages they cover
+    chunks = chunk_document_pages(pages, chunk_size, chunk_overlap)
+
+    new_chunks = [chunk for chunk in chunks if chunk["id"] not in indexed_ids]
+    if new_chunks:
+        if embedding_function is None:
+            raise ValueError(f"{pdf_path}: {len(new_chunks)} chunks need embedding but no embedding_function was given")
+        write_chunks(collection, embedding_function, [chunk["id"] for chunk in new_chunks],
+                     [chunk["text"] for chunk in new_chunks], [chunk["metadata"] for chunk in new_chunks])
+
+    # Chunks that kept their text still get the current page hashes
+    kept = [chunk for chunk in chunks if chunk["id"] in indexed_ids]
+    if kept:
+        collection.update(ids=[chunk["id"] for chunk in kept], metadatas=[chunk["metadata"] for chunk in kept])
+
+    stale_ids = sorted(indexed_ids - {chunk["id"] for chunk in chunks})
+    if stale_ids:
+        collection.delete(ids=stale_ids)
+
+    result.update(embedded=len(new_chunks), deleted=len(stale_ids))
+    print(f"{pdf_path}: {len(changed)} changed, {len(removed)} removed, {unchanged} unchanged pages; "
+          f"{len(new_chunks)} chunks embedded, {len(stale_ids)} deleted")
+    return result
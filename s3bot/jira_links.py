@@ -9,7 +9,7 @@ def extract_jira_keys_from_response(response_text):
     return list(set(re.findall(r'\b[A-Z]+-\d+\b', response_text)))  # Unique Jira keys
 
 def query_chromadb_and_generate_response(user_query, embedding_function, collection, model_id, region="us-east-1"):
-    query_embedding = embedding_function([user_query])[0]
+    query_embedding = embedding_function.embed_query(user_query)
     results = collection.query(query_embedding, n_results=5)
 
     if not results or "documents" not in results or not results["documents"]:
@@ -0,0 +1,126 @@
+import sqlite3
+import threading
+import time
+
+from chunker import CHUNKER_VERSION
+from page_cache import file_sha256
+
+MANIFEST_PATH = "./ingest_manifest.sqlite3"
+
+# Page status: CHUNKED once the page text is extracted and split, EMBEDDED once its chunks are stored
+CHUNKED = "chunked"
+EMBEDDED = "embedded"
+
+
+def pipeline_version(model_id, chunk_size, chunk_overlap):
+    """Identifies the embedding model and chunker settings; a change invalidates recorded progress."""
+    return f"{model_id}|{CHUNKER_VERSION}|{chunk_size}/{chunk_overlap}"
+
+
+class IngestManifest:
+    """
+    Transactional record of ingestion progress, replacing processed_pdfs.json.
+
+    For every source PDF it stores the file hash and pipeline version, and for
+    every page its chunk count and whether it was chunked or embedded. Each update is
+    its own SQLite transaction, so an interrupted run loses at most the batch
+    that was being embedded. The next run skips the pages that are already
+    embedded, as long as the file bytes and pipeline version are unchanged;
+    otherwise the file starts over. One connection is shared behind a lock, so
+    ThreadPoolExecutor workers can update it concurrently.
+    """
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                " source TEXT PRIMARY KEY,"
+                " file_hash TEXT NOT NULL,"
+                " version TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                " source TEXT NOT NULL,"
+                " page INTEGER NOT NULL,"
+                " status TEXT NOT NULL,"
+                " chunks INTEGER NOT NULL DEFAULT 0,"
+                " updated_at REAL NOT NULL,"
+                " PRIMARY KEY (source, page))"
+            )
+
+    def is_done(self, source, file_hash, version):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_hash, version, status FROM files WHERE source = ?", (source,)
+            ).fetchone()
+        return row == (file_hash, version, "done")
+
+    def start_file(self, source, file_hash, version):
+        """
+        Registers source for ingestion.
+
+        Returns:
+            set: Pages already embedded by an earlier run with the same file hash
+            and version. Empty when the file or pipeline changed, in which case
+            its old page records are dropped.
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT file_hash, version FROM files WHERE source = ?", (source,)).fetchone()
+            if row != (file_hash, version):
+                self._conn.execute("DELETE FROM pages WHERE source = ?", (source,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (source, file_hash, version, status, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (source, file_hash, version, "in_progress", time.time()),
+            )
+            return {page for (page,) in self._conn.execute(
+                "SELECT page FROM pages WHERE source = ? AND status = ?", (source, EMBEDDED))}
+
+    def mark_pages(self, source, pages, status, chunks=None):
+        """
+        Sets the status of pages in one transaction.
+
+        chunks maps page number -> chunk count; pages without an entry keep their count.
+        """
+        now = time.time()
+        chunks = chunks or {}
+        with self._lock, self._conn:
+            for page in pages:
+                self._conn.execute(
+                    "INSERT INTO pages (source, page, status, chunks, updated_at) VALUES (?, ?, ?, ?, ?)"
+                    " ON CONFLICT (source, page) DO UPDATE SET status = excluded.status,"
+                    " chunks = CASE WHEN ? THEN excluded.chunks ELSE pages.chunks END,"
+                    " updated_at = excluded.updated_at",
+                    (source, page, status, chunks.get(page, 0), now, page in chunks),
+                )
+
+    def finish_file(self, source):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE files SET status = 'done', updated_at = ? WHERE source = ?",
+                               (time.time(), source))
+
+    def forget(self, source):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM pages WHERE source = ?", (source,))
+            self._conn.execute("DELETE FROM files WHERE source = ?", (source,))
+
+    def progress(self, source):
+        """Returns {status: page count} for source."""
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM pages WHERE source = ? GROUP BY status", (source,)))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def source_state(pdf_path, model_id, chunk_size, chunk_overlap):
+    """(file hash, pipeline version) of pdf_path, as recorded by the manifest."""
+    return file_sha256(pdf_path), pipeline_version(model_id, chunk_size, chunk_overlap)
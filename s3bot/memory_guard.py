@@ -0,0 +1,72 @@
+import gc
+import os
+import resource
+import time
+
+RSS_LIMIT_MB = 2048
+THROTTLE_POLL_SECONDS = 0.5
+THROTTLE_MAX_WAIT_SECONDS = 60
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB (falls back to the peak on non-Linux hosts)."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def release_page(page, pdf=None):
+    """
+    Drops the parsed chars/layout objects pdfplumber keeps on a page.
+
+    pdfminer also caches every resolved PDF object on the document, which is
+    what grows without bound on big scanned manuals, so that is cleared too.
+    """
+    if hasattr(page, "close"):
+        page.close()
+    else:
+        page.flush_cache()
+    cached_objs = getattr(getattr(pdf, "doc", None), "_cached_objs", None)
+    if cached_objs is not None:
+        cached_objs.clear()
+
+
+class MemoryThrottle:
+    """
+    Pauses extraction while RSS is above rss_limit_mb and the downstream
+    stages still hold queued work, so they can drain before more pages are read.
+
+    pending() returns the number of items still queued downstream. Waiting
+    only helps while there is something left to drain: CPython and glibc
+    rarely hand freed memory back to the OS, so RSS can stay above the limit
+    with empty queues. When that happens, or after max_wait_seconds, the
+    throttle warns once and stops throttling for the rest of the run instead
+    of stalling every later page.
+    """
+
+    def __init__(self, rss_limit_mb, pending=None, poll_seconds=THROTTLE_POLL_SECONDS,
+                 max_wait_seconds=THROTTLE_MAX_WAIT_SECONDS):
+        self.rss_limit_mb = rss_limit_mb
+        self.pending = pending or (lambda: 0)
+        self.poll_seconds = poll_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self.disabled = False
+        self.waited_seconds = 0.0
+
+    def wait(self):
+        if self.disabled or current_rss_mb() <= self.rss_limit_mb:
+            return
+        gc.collect()
+        waited = 0
+        while current_rss_mb() > self.rss_limit_mb:
+            if self.pending() == 0 or waited >= self.max_wait_seconds:
+                print(f"⚠️ RSS stays at {current_rss_mb():.0f} MB, above the {self.rss_limit_mb} MB limit, "
+                      f"with {self.pending()} items queued downstream; no longer throttling extraction")
+                self.disabled = True
+                break
+            time.sleep(self.poll_seconds)
+            waited += self.poll_seconds
+        self.waited_seconds += waited
@@ -0,0 +1,416 @@
+import argparse
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+NUMPY_INDEX_DIR = "./numpy_index"
+VECTOR_STORE = os.environ.get("VECTOR_STORE", "chroma")  # "chroma" or "numpy"
+INITIAL_CAPACITY = 1024  # rows; the vector file doubles when full
+SCORE_BLOCK = 65536  # rows upcast and scored at a time, bounds the float16 working copy
+_SQL_BATCH = 500  # ids per SELECT, below SQLite's bound-parameter limit
+
+
+def _normalize(vectors):
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _where_sql(where):
+    """
+    Translates the equality subset of Chroma's where filter ({"key": value},
+    {"key": {"$eq": value}}, {"$and": [...]}) into a SQL condition on the metadata JSON.
+    """
+    clauses, params = [], []
+    for key, value in where.items():
+        if key == "$and":
+            for condition in value:
+                clause, sub_params = _where_sql(condition)
+                clauses.append(clause)
+                params.extend(sub_params)
+            continue
+        if key.startswith("$"):
+            raise ValueError(f"Unsupported where operator for the numpy index: {key}")
+        if isinstance(value, dict):
+            if set(value) != {"$eq"}:
+                raise ValueError(f"Unsupported where condition for the numpy index: {value}")
+            value = value["$eq"]
+        clauses.append("json_extract(metadata, ?) = ?")
+        params.extend([f'$."{key}"', value])
+    return " AND ".join(clauses) or "1", params
+
+
+class NumpyIndex:
+    """
+    Exact-search vector store with the parts of the ChromaDB collection
+    interface the apps use: add, upsert, update, get, delete, count and query.
+
+    Unit-length vectors live in a memory-mapped .npy file (vectors.npy) and
+    ids, documents and metadata in a SQLite sidecar (metadata.sqlite3), where
+    each chunk's row number is its position in the matrix. The file is mapped
+    read-only, so every Streamlit process on the host shares the same page
+    cache pages instead of loading its own copy. A query scores all rows with
+    one matrix multiply and picks the top k with argpartition; distances are
+    cosine distances (1 - similarity), as in a Chroma "cosine" collection.
+
+    Writers take an fcntl lock on the directory. Vectors are written before the
+    SQLite commit that makes their rows visible, and deleted rows are only
+    marked free (and reused later), so a concurrent reader never attaches a
+    vector to the wrong chunk. Queries score free rows as -inf through a
+    mask that is rebuilt only when a write bumped the generation counter. When the file is full it is copied into one
+    twice the size and swapped in with os.replace; readers remap on their
+    next query.
+    """
+
+    def __init__(self, path=NUMPY_INDEX_DIR, embedding_function=None, dtype="float32"):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.name = os.path.basename(os.path.normpath(path))
+        self.embedding_function = embedding_function
+        self.vectors_path = os.path.join(path, "vectors.npy")
+        self.lock_path = os.path.join(path, "write.lock")
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._mapped_file = None
+        self._free_rows = (None, np.empty(0, dtype=np.int64))  # (generation, rows with no chunk)
+        self._conn = sqlite3.connect(os.path.join(path, "metadata.sqlite3"), timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS rows ("
+                " row INTEGER PRIMARY KEY,"
+                " id TEXT UNIQUE,"  # NULL marks a free row
+                " document TEXT,"
+                " metadata TEXT)"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn.execute("INSERT OR IGNORE INTO meta VALUES ('dtype', ?)", (np.dtype(dtype).name,))
+            for key in ("size", "free", "generation"):
+                self._conn.execute("INSERT OR IGNORE INTO meta VALUES (?, '0')", (key,))
+        self.dtype = np.dtype(self._meta("dtype"))
+
+    def _meta(self, key):
+        return self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def _set_meta(self, key, value):
+        self._conn.execute("UPDATE meta SET value = ? WHERE key = ?", (str(value), key))
+
+    def _bump_generation(self):
+        self._conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'generation'")
+
+    def _free_row_numbers(self):
+        """Rows below size that hold no chunk, re-read from SQLite only after a write."""
+        generation = self._meta("generation")
+        if self._free_rows[0] != generation:
+            rows = [row for (row,) in self._conn.execute("SELECT row FROM rows WHERE id IS NULL")]
+            self._free_rows = (generation, np.array(rows, dtype=np.int64))
+        return self._free_rows[1]
+
+    def _mapped(self):
+        """The read-only mapping of the vector file, remapped if a writer grew (replaced) it."""
+        try:
+            stat = os.stat(self.vectors_path)
+        except FileNotFoundError:
+            return None
+        if (stat.st_ino, stat.st_size) != self._mapped_file:
+            self._matrix = np.load(self.vectors_path, mmap_mode="r")
+            self._mapped_file = (stat.st_ino, stat.st_size)
+        return self._matrix
+
+    def _writable(self, rows_needed, dimensions):
+        """Opens the vector file for writing, creating or doubling it until it holds rows_needed rows."""
+        if not os.path.exists(self.vectors_path):
+            capacity = max(INITIAL_CAPACITY, rows_needed)
+            np.lib.format.open_memmap(self.vectors_path, mode="w+", dtype=self.dtype, shape=(capacity, dimensions))
+        matrix = np.load(self.vectors_path, mmap_mode="r+")
+        if matrix.shape[1] != dimensions:
+            raise ValueError(f"Index {self.path} holds {matrix.shape[1]}-dimensional vectors, got {dimensions}")
+        if matrix.shape[0] < rows_needed:
+            capacity = matrix.shape[0]
+            while capacity < rows_needed:
+                capacity *= 2
+            tmp_path = self.vectors_path + ".tmp"
+            grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=self.dtype, shape=(capacity, dimensions))
+            grown[:matrix.shape[0]] = matrix
+            grown.flush()
+            del matrix
+            os.replace(tmp_path, self.vectors_path)
+            matrix = grown
+        return matrix
+
+    def _rows_for_ids(self, ids):
+        found = {}
+        for start in range(0, len(ids), _SQL_BATCH):
+            batch = ids[start:start + _SQL_BATCH]
+            found.update(self._conn.execute(
+                f"SELECT id, row FROM rows WHERE id IN ({','.join('?' * len(batch))})", batch
+            ).fetchall())
+        return found
+
+    def _embed(self, documents):
+        if self.embedding_function is None:
+            raise ValueError("No embeddings given and the index has no embedding_function")
+        return getattr(self.embedding_function, "embed", self.embedding_function)(list(documents))
+
+    def count(self):
+        with self._lock:
+            return int(self._meta("size")) - int(self._meta("free"))
+
+    def _upsert_locked(self, latest, vectors, metadatas, documents):
+        """
+        Writes vectors[idx], documents[idx] and metadatas[idx] for every
+        {chunk_id: idx} in latest. The caller holds both locks and the transaction.
+        """
+        rows = self._rows_for_ids(list(latest))
+        new_ids = [chunk_id for chunk_id in latest if chunk_id not in rows]
+        free_rows = [row for (row,) in self._conn.execute(
+            "SELECT row FROM rows WHERE id IS NULL ORDER BY row LIMIT ?", (len(new_ids),))]
+        size = int(self._meta("size"))
+        appended = range(size, size + len(new_ids) - len(free_rows))
+        rows.update(zip(new_ids, free_rows + list(appended)))
+
+        matrix = self._writable(size + len(appended), vectors.shape[1])
+        targets = [rows[chunk_id] for chunk_id in latest]
+        matrix[targets] = vectors[list(latest.values())]
+        matrix.flush()
+        del matrix
+
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO rows (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+            [(rows[chunk_id], chunk_id, documents[idx], json.dumps(metadatas[idx]))
+             for chunk_id, idx in latest.items()],
+        )
+        self._set_meta("size", size + len(appended))
+        self._set_meta("free", int(self._meta("free")) - len(free_rows))
+        self._bump_generation()
+
+    def upsert(self, ids, embeddings=None, metadatas=None, documents=None):
+        """Inserts new ids and overwrites existing ones, like collection.upsert."""
+        if not ids:
+            return
+        if embeddings is None:
+            embeddings = self._embed(documents)
+        vectors = _normalize(embeddings)
+        documents = documents if documents is not None else [None] * len(ids)
+        metadatas = metadatas if metadatas is not None else [None] * len(ids)
+        # The last occurrence of a repeated id wins, as in Chroma
+        latest = {chunk_id: idx for idx, chunk_id in enumerate(ids)}
+
+        with open(self.lock_path, "a") as lock_file, self._lock:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            with self._conn:
+                self._upsert_locked(latest, vectors, metadatas, documents)
+
+    def update(self, ids, embeddings=None, metadatas=None, documents=None):
+        """
+        Changes stored chunks in place, like collection.update: metadata keys are
+        merged into the stored ones (a None value removes the key), and new
+        documents are re-embedded unless embeddings are given. Unknown ids are skipped.
+        """
+        if not ids:
+            return
+        if embeddings is None and documents is not None:
+            embeddings = self._embed(documents)
+        vectors = _normalize(embeddings) if embeddings is not None else None
+
+        with open(self.lock_path, "a") as lock_file, self._lock:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            with self._conn:
+                records = {record[1]: record for record in self._select(list(ids))}
+                known = [idx for idx, chunk_id in enumerate(ids) if chunk_id in records]
+                if not known:
+                    return
+
+                if vectors is not None:
+                    matrix = self._writable(int(self._meta("size")), vectors.shape[1])
+                    matrix[[records[ids[idx]][0] for idx in known]] = vectors[known]
+                    matrix.flush()
+                    del matrix
+
+                updates = []
+                for idx in known:
+                    row, chunk_id, document, metadata = records[ids[idx]]
+                    if documents is not None:
+                        document = documents[idx]
+                    if metadatas is not None and metadatas[idx] is not None:
+                        merged = {**(json.loads(metadata) or {}), **metadatas[idx]}
+                        metadata = json.dumps({key: value for key, value in merged.items() if value is not None})
+                    updates.append((document, metadata, row))
+                self._conn.executemany("UPDATE rows SET document = ?, metadata = ? WHERE row = ?", updates)
+
+    def add(self, ids, embeddings=None, metadatas=None, documents=None):
+        """Like upsert, but ids that are already stored are left unchanged."""
+        if not ids:
+            return
+        # Only embed documents whose ids look new; the check is repeated under the write lock
+        with self._lock:
+            existing = self._rows_for_ids(list(ids))
+        keep = [idx for idx, chunk_id in enumerate(ids) if chunk_id not in existing]
+        if not keep:
+            return
+        pick = lambda values: [values[idx] for idx in keep] if values is not None else [None] * len(keep)
+        ids, metadatas, documents = pick(ids), pick(metadatas), pick(documents)
+        vectors = _normalize(pick(embeddings) if embeddings is not None else self._embed(documents))
+
+        with open(self.lock_path, "a") as lock_file, self._lock:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            with self._conn:
+                existing = self._rows_for_ids(ids)
+                latest = {chunk_id: idx for idx, chunk_id in enumerate(ids) if chunk_id not in existing}
+                if latest:
+                    self._upsert_locked(latest, vectors, metadatas, documents)
+
+    def _select(self, ids=None, where=None, limit=None, offset=None):
+        """[(row, id, document, metadata JSON)] of live rows matching ids and where."""
+        condition, params = _where_sql(where or {})
+        query = f"SELECT row, id, document, metadata FROM rows WHERE id IS NOT NULL AND {condition}"
+        if ids is None:
+            query += " ORDER BY row"
+            if limit is not None:
+                query += f" LIMIT {int(limit)} OFFSET {int(offset or 0)}"
+            return self._conn.execute(query, params).fetchall()
+        found = []
+        for start in range(0, len(ids), _SQL_BATCH):
+            batch = ids[start:start + _SQL_BATCH]
+            found.extend(self._conn.execute(
+                f"{query} AND id IN ({','.join('?' * len(batch))})", params + list(batch)
+            ).fetchall())
+        return found
+
+    def _result(self, records, include):
+        result = {"ids": [record[1] for record in records]}
+        if "documents" in include:
+            result["documents"] = [record[2] for record in records]
+        if "metadatas" in include:
+            result["metadatas"] = [json.loads(record[3]) for record in records]
+        if "embeddings" in include:
+            matrix = self._mapped()
+            result["embeddings"] = [matrix[record[0]].astype(np.float32).tolist() for record in records]
+        return result
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("metadatas", "documents")):
+        with self._lock:
+            records = self._select(ids, where, limit, offset)
+            return self._result(records, include)
+
+    def delete(self, ids=None, where=None):
+        """Frees the rows of the matching chunks; their slots are reused by later inserts."""
+        with open(self.lock_path, "a") as lock_file, self._lock:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            with self._conn:
+                rows = [record[0] for record in self._select(ids, where)]
+                self._conn.executemany(
+                    "UPDATE rows SET id = NULL, document = NULL, metadata = NULL WHERE row = ?",
+                    [(row,) for row in rows],
+                )
+                self._set_meta("free", int(self._meta("free")) + len(rows))
+                self._bump_generation()
+
+    def _scores(self, matrix, size, query_vectors, rows=None):
+        if rows is not None:
+            return matrix[rows].astype(np.float32) @ query_vectors.T
+        scores = np.empty((size, len(query_vectors)), dtype=np.float32)
+        for start in range(0, size, SCORE_BLOCK):
+            block = matrix[start:min(size, start + SCORE_BLOCK)]
+            # float16 is a storage format: numpy has no fast half-precision matmul
+            scores[start:start + len(block)] = block.astype(np.float32, copy=False) @ query_vectors.T
+        return scores
+
+    def query(self, query_embeddings=None, n_results=10, where=None,
+              include=("metadatas", "documents", "distances"), query_texts=None):
+        """
+        Exact top n_results by cosine similarity, in the shape of collection.query:
+        one list per query under "ids", "documents", "metadatas" and "distances".
+        """
+        if query_embeddings is None:
+            embed_query = getattr(self.embedding_function, "embed_query", None)
+            query_embeddings = [embed_query(text) for text in query_texts] if embed_query else self._embed(query_texts)
+        query_vectors = _normalize(query_embeddings)
+
+        with self._lock:
+            size = int(self._meta("size"))
+            candidates = np.array([record[0] for record in self._select(where=where)]) if where else None
+            free_rows = self._free_row_numbers() if candidates is None else None
+        matrix = self._mapped()
+        live_count = len(candidates) if candidates is not None else size - len(free_rows)
+        if matrix is None or live_count == 0:
+            return {"ids": [[] for _ in query_vectors], **{field: [[] for _ in query_vectors] for field in include}}
+
+        scores = self._scores(matrix, size, query_vectors, candidates)
+        if free_rows is not None and len(free_rows):
+            # Free rows still hold old vectors; they can never be picked
+            scores[free_rows] = -np.inf
+        k = min(live_count, n_results)
+        picked = []
+        for column in scores.T:
+            top = np.argpartition(-column, k - 1)[:k]
+            top = top[np.argsort(-column[top])]
+            rows = candidates[top] if candidates is not None else top
+            picked.append((rows, column[top]))
+
+        with self._lock:
+            all_rows = sorted({int(row) for rows, _ in picked for row in rows})
+            records = {}
+            for start in range(0, len(all_rows), _SQL_BATCH):
+                batch = all_rows[start:start + _SQL_BATCH]
+                for record in self._conn.execute(
+                    f"SELECT row, id, document, metadata FROM rows"
+                    f" WHERE id IS NOT NULL AND row IN ({','.join('?' * len(batch))})", batch
+                ):
+                    records[record[0]] = record
+
+        results = {"ids": []}
+        for field in include:
+            results[field] = []
+        for rows, row_scores in picked:
+            live = [(records[int(row)], score) for row, score in zip(rows, row_scores) if int(row) in records]
+            live = live[:n_results]
+            result = self._result([record for record, _ in live], include)
+            results["ids"].append(result["ids"])
+            for field in include:
+                results[field].append(
+                    [float(1 - score) for _, score in live] if field == "distances" else result[field]
+                )
+        return results
+
+    def close(self):
+        self._conn.close()
+
+
+def import_collection(collection, index, batch_size=1000):
+    """Copies every chunk of a ChromaDB collection, with its stored embedding, into index."""
+    total = collection.count()
+    start = time.perf_counter()
+    for offset in range(0, total, batch_size):
+        batch = collection.get(limit=batch_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+        index.upsert(batch["ids"], batch["embeddings"], batch["metadatas"], batch["documents"])
+        print(f"Imported {min(offset + batch_size, total)}/{total} chunks")
+    print(f"✅ Imported {total} chunks into {index.path} in {time.perf_counter() - start:.1f}s")
+
+
+def open_vector_store(embedding_function, name="my_collection", chroma_path="./chromadb", index_path=NUMPY_INDEX_DIR):
+    """The numpy index when VECTOR_STORE=numpy, otherwise the ChromaDB collection name."""
+    if VECTOR_STORE == "numpy":
+        return NumpyIndex(index_path, embedding_function=embedding_function)
+    import chromadb
+    client = chromadb.PersistentClient(path=chroma_path)
+    return client.get_or_create_collection(name=name, embedding_function=embedding_function)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a numpy exact-search index from a ChromaDB collection")
+    parser.add_argument("--chroma", default="./chromadb", help="ChromaDB persist directory")
+    parser.add_argument("--collection", default="my_collection")
+    parser.add_argument("--out", default=NUMPY_INDEX_DIR, help="index directory to create or update")
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    args = parser.parse_args()
+
+    import chromadb
+    source = chromadb.PersistentClient(path=args.chroma).get_collection(args.collection)
+    import_collection(source, NumpyIndex(args.out, dtype=args.dtype))
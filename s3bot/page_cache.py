@@ -0,0 +1,163 @@
+import hashlib
+import sqlite3
+import threading
+import time
+
+from extractors import EXTRACTORS, get_extractor, select_extractor
+
+PAGE_CACHE_PATH = "./page_cache.sqlite3"
+PAGE_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 2 GB of extracted text
+
+
+def file_sha256(path, block_size=1024 * 1024):
+    """Hashes the file bytes, so renamed files hit the cache and re-exports miss it."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class PageTextCache:
+    """
+    On-disk cache of extracted page text keyed by (SHA-256 of the PDF, page number).
+
+    Entries are evicted least-recently-used first once the stored text exceeds
+    max_bytes. The stored size is kept as a running total in the meta table,
+    so a put does not scan the whole cache. SQLite handles locking, so several
+    ingestion processes on the same host can share one cache file.
+    """
+
+    def __init__(self, path=PAGE_CACHE_PATH, max_bytes=PAGE_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                " file_hash TEXT NOT NULL,"
+                " page INTEGER NOT NULL,"
+                " text TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_access REAL NOT NULL,"
+                " PRIMARY KEY (file_hash, page))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access)")
+            # Page count and extraction backend of every file seen, so a fully cached file is served
+            # without opening the PDF, and with the same backend's text
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                " file_hash TEXT PRIMARY KEY,"
+                " page_count INTEGER NOT NULL,"
+                " extractor TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._conn.execute(
+                "INSERT OR IGNORE INTO meta (key, value) SELECT 'total_size', COALESCE(SUM(size), 0) FROM pages"
+            )
+
+    def get(self, file_hash, page):
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT text FROM pages WHERE file_hash = ? AND page = ?", (file_hash, page)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE pages SET last_access = ? WHERE file_hash = ? AND page = ?",
+                (time.time(), file_hash, page),
+            )
+            return row[0]
+
+    def file_extractor(self, file_hash):
+        """Name of the backend the file's cached pages were extracted with, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT extractor FROM files WHERE file_hash = ?", (file_hash,)).fetchone()
+            return row[0] if row else None
+
+    def get_file(self, file_hash):
+        """Returns [(page_number, text), ...] if every page of the file is cached, otherwise None."""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT page_count FROM files WHERE file_hash = ?", (file_hash,)).fetchone()
+            if row is None:
+                return None
+            pages = self._conn.execute(
+                "SELECT page, text FROM pages WHERE file_hash = ? ORDER BY page", (file_hash,)
+            ).fetchall()
+            if len(pages) != row[0]:
+                return None  # some pages were evicted
+            self._conn.execute("UPDATE pages SET last_access = ? WHERE file_hash = ?", (time.time(), file_hash))
+            return pages
+
+    def set_file(self, file_hash, page_count, extractor):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO files (file_hash, page_count, extractor) VALUES (?, ?, ?)",
+                               (file_hash, page_count, extractor))
+
+    def put(self, file_hash, page, text):
+        size = len(text.encode("utf-8"))
+        with self._lock, self._conn:
+            old = self._conn.execute(
+                "SELECT size FROM pages WHERE file_hash = ? AND page = ?", (file_hash, page)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (file_hash, page, text, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                (file_hash, page, text, size, time.time()),
+            )
+            self._conn.execute("UPDATE meta SET value = value + ? WHERE key = 'total_size'",
+                               (size - (old[0] if old else 0),))
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT value FROM meta WHERE key = 'total_size'").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Evict down to 90% so the scan below is not repeated on every put
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute("SELECT file_hash, page, size FROM pages ORDER BY last_access").fetchall()
+        for file_hash, page, size in rows:
+            if total <= target:
+                break
+            self._conn.execute("DELETE FROM pages WHERE file_hash = ? AND page = ?", (file_hash, page))
+            total -= size
+        self._conn.execute("UPDATE meta SET value = ? WHERE key = 'total_size'", (total,))
+
+    def close(self):
+        self._conn.close()
+
+
+def extract_pages_cached(pdf_path, cache, extractor="auto"):
+    """
+    Returns [(page_number, text), ...] for every page of pdf_path.
+
+    Pages already in the cache are served from it; the PDF is only opened
+    when some pages of this file content are missing. Text comes from the
+    extractors interface: the named backend, or with "auto" the backend
+    that produced the cached pages, else the one select_extractor picks.
+    """
+    file_hash = file_sha256(pdf_path)
+    recorded = cache.file_extractor(file_hash)
+    if extractor == "auto" and recorded in EXTRACTORS and EXTRACTORS[recorded].available():
+        extractor = recorded
+    if extractor == recorded:
+        cached = cache.get_file(file_hash)
+        if cached is not None:
+            return cached
+    backend = select_extractor(pdf_path) if extractor == "auto" else get_extractor(extractor)
+    reuse = backend.name == recorded  # pages cached from another backend are re-extracted
+
+    pages = []
+    document = backend.open(pdf_path)
+    try:
+        for page_num in range(1, backend.document_page_count(document) + 1):
+            text = cache.get(file_hash, page_num) if reuse else None
+            if text is None:
+                _, text = next(backend.extract_open(document, [page_num]))
+                cache.put(file_hash, page_num, text)
+            pages.append((page_num, text))
+    finally:
+        backend.close(document)
+    cache.set_file(file_hash, len(pages), backend.name)
+    return pages
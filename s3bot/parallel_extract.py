@@ -0,0 +1,131 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from langchain.docstore.document import Document
+
+from chunker import CHUNK_OVERLAP, CHUNK_SIZE
+from extractors import get_extractor, select_extractor
+from pipeline import chunk_document
+
+# Pages handed to a worker per task. Each task opens the PDF once, so larger
+# ranges amortise the open cost while smaller ones balance load better.
+PAGES_PER_TASK = 20
+
+
+def inspect_pdf(pdf_path):
+    """
+    Worker: (extractor name, page count) of pdf_path, or None if it cannot be read.
+
+    select_extractor benchmarks the backends on a page sample; running it in
+    the pool benchmarks all files at once instead of one after another.
+    """
+    try:
+        extractor = select_extractor(pdf_path)
+        return extractor.name, extractor.page_count(pdf_path)
+    except Exception as e:
+        print(f"Error reading {pdf_path}: {str(e)}")
+        return None
+
+
+def plan_page_tasks(pdf_paths, executor, pages_per_task=PAGES_PER_TASK):
+    """
+    Splits every PDF into (pdf_path, first_page, last_page, extractor_name) tasks.
+
+    The extractor is selected once per PDF, on the pool, so every range of a
+    file is read with the backend the serial path would use. Page numbers
+    are 1-based and inclusive, matching the "page" metadata. Tasks are
+    returned in file order and then page order.
+    """
+    tasks = []
+    for pdf_path, inspected in zip(pdf_paths, executor.map(inspect_pdf, pdf_paths)):
+        if inspected is None:
+            continue
+        extractor_name, total_pages = inspected
+        for first_page in range(1, total_pages + 1, pages_per_task):
+            last_page = min(first_page + pages_per_task - 1, total_pages)
+            tasks.append((pdf_path, first_page, last_page, extractor_name))
+    return tasks
+
+
+def extract_page_range(task):
+    """
+    Worker: extracts one page range of one PDF.
+
+    Runs inside a pool process, so it only takes and returns picklable values.
+
+    Returns:
+        list: (page_number, text) tuples in page order, or None if the range could not be read.
+    """
+    pdf_path, first_page, last_page, extractor_name = task
+    try:
+        extractor = get_extractor(extractor_name)
+        return list(extractor.extract_pages(pdf_path, list(range(first_page, last_page + 1))))
+    except Exception as e:
+        print(f"Error reading {pdf_path} pages {first_page}-{last_page}: {str(e)}")
+        return None
+
+
+def _chunk_extracted(pdf_path, extractor_name, page_texts, chunk_size, chunk_overlap):
+    if page_texts is None:
+        print(f"Skipping {pdf_path}: some of its pages could not be read")
+        return []
+    try:
+        return chunk_document(pdf_path, chunk_size, chunk_overlap, extractor=extractor_name, page_texts=page_texts)
+    except Exception as e:
+        print(f"Error chunking {pdf_path}: {str(e)}")
+        return []
+
+
+def chunk_pdfs_parallel(pdf_paths, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, max_workers=None,
+                        pages_per_task=PAGES_PER_TASK):
+    """
+    Extracts several PDFs across a process pool and chunks them like the serial path.
+
+    Extraction is the expensive part and runs on the pool; once all ranges of
+    a file are back, the parent strips its boilerplate and chunks it across
+    page breaks with pipeline.chunk_document, while the pool keeps extracting
+    the next files. Serial and parallel ingestion therefore store the same
+    chunks under the same IDs.
+
+    Args:
+        pdf_paths (list): Paths of the PDFs to process.
+        chunk_size (int): Chunk budget in characters (see make_text_splitter).
+        chunk_overlap (int): Overlap between neighbouring chunks, in characters.
+        max_workers (int): Pool size, defaults to the number of CPUs.
+        pages_per_task (int): Pages extracted per pool task.
+
+    Returns:
+        list: {"id", "text", "metadata"} chunk items in file and page order.
+    """
+    chunks = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        tasks = plan_page_tasks(pdf_paths, executor, pages_per_task)
+        current, extractor_name, page_texts = None, None, []
+        # executor.map yields results in submission order, so the ranges of one
+        # file arrive together and in page order, whichever worker finishes first
+        for (pdf_path, _, _, task_extractor), pages in zip(tasks, executor.map(extract_page_range, tasks)):
+            if pdf_path != current:
+                if current is not None:
+                    chunks.extend(_chunk_extracted(current, extractor_name, page_texts, chunk_size, chunk_overlap))
+                current, extractor_name, page_texts = pdf_path, task_extractor, []
+            if pages is None:
+                page_texts = None  # one unreadable range makes the whole file unreadable, as in the serial path
+            elif page_texts is not None:
+                page_texts.extend(pages)
+        if current is not None:
+            chunks.extend(_chunk_extracted(current, extractor_name, page_texts, chunk_size, chunk_overlap))
+    return chunks
+
+
+def chunk_pdf_dir_parallel(pdf_dir, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, max_workers=None):
+    """Runs chunk_pdfs_parallel over every PDF in pdf_dir, in sorted filename order."""
+    pdf_paths = [os.path.join(pdf_dir, f) for f in sorted(os.listdir(pdf_dir)) if f.endswith(".pdf")]
+    return chunk_pdfs_parallel(pdf_paths, chunk_size, chunk_overlap, max_workers)
+
+
+def read_and_chunk_pdf_parallel(pdf_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, max_workers=None):
+    """Parallel counterpart of read_and_chunk_pdf, returning langchain Documents."""
+    return [
+        Document(page_content=chunk["text"], metadata=chunk["metadata"])
+        for chunk in chunk_pdfs_parallel([pdf_path], chunk_size, chunk_overlap, max_workers)
+    ]
@@ -0,0 +1,406 @@
+import hashlib
+import json
+import queue
+import threading
+import time
+
+from langchain.docstore.document import Document
+
+from chunker import CHUNK_OVERLAP, CHUNK_SIZE, PageSpanChunker, make_text_splitter
+from chunk_ids import make_chunk_id, new_chunk_indexes, source_name
+from boilerplate import BoilerplateFilter
+from dedup import ChunkDeduplicator
+from extractors import get_extractor, sample_page_numbers, select_extractor
+from memory_guard import MemoryThrottle, current_rss_mb
+
+_DONE = object()
+
+
+class Stage:
+    """
+    One step of a streaming pipeline.
+
+    fn takes a single item and returns a list of output items (empty to drop
+    the item). workers threads run fn concurrently. If the stage is stateful
+    (for example a batcher) it can expose flush(), which is called once after
+    the last input item to emit whatever is still buffered.
+
+    item_size maps an input item to the number of chunks it carries, so the
+    chunks lost in failed items are counted in failed_items.
+    """
+
+    def __init__(self, name, fn, workers=1, queue_size=8, item_size=None):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.queue_size = queue_size
+        self.item_size = item_size or (lambda item: 1)
+        self.processed = 0
+        self.errors = 0
+        self.failed_items = 0
+        self.queue = None  # output queue, set by run_pipeline
+
+
+class Batcher:
+    """Groups single items into lists of batch_size; use with a one-worker Stage."""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self._batch = []
+
+    def __call__(self, item):
+        self._batch.append(item)
+        if len(self._batch) < self.batch_size:
+            return []
+        batch, self._batch = self._batch, []
+        return [batch]
+
+    def flush(self):
+        batch, self._batch = self._batch, []
+        return [batch] if batch else []
+
+
+def _feed(source, out_q):
+    try:
+        for item in source:
+            out_q.put(item)  # blocks while the next stage is behind (backpressure)
+    except Exception as e:
+        print(f"Pipeline source failed: {e}")
+    finally:
+        out_q.put(_DONE)
+
+
+def _run_stage(stage, in_q, out_q, state):
+    while True:
+        item = in_q.get()
+        if item is _DONE:
+            in_q.put(_DONE)  # let sibling workers see it too
+            break
+        try:
+            outputs = stage.fn(item)
+        except Exception as e:
+            print(f"Error in pipeline stage '{stage.name}': {e}")
+            with state["lock"]:
+                stage.errors += 1
+                stage.failed_items += stage.item_size(item)
+            continue
+        for output in outputs:
+            out_q.put(output)
+        with state["lock"]:
+            stage.processed += 1
+
+    with state["lock"]:
+        state["running"] -= 1
+        last_worker = state["running"] == 0
+    if last_worker:
+        try:
+            flush = getattr(stage.fn, "flush", None)
+            if flush is not None:
+                for output in flush():
+                    out_q.put(output)
+        except Exception as e:
+            print(f"Error flushing pipeline stage '{stage.name}': {e}")
+            with state["lock"]:
+                stage.errors += 1
+        finally:
+            # Always sent, otherwise the consumer of run_pipeline waits forever
+            out_q.put(_DONE)
+
+
+def run_pipeline(source, stages, source_queue_size=8):
+    """
+    Streams items from source through stages connected by bounded queues.
+
+    Every stage runs in its own thread pool, so a slow stage (for example the
+    embedding calls) overlaps with the others, and a full queue blocks the
+    stage feeding it. Memory therefore depends on the queue sizes, not on how
+    much the source produces.
+
+    Yields the outputs of the final stage as they arrive.
+    """
+    in_q = queue.Queue(maxsize=source_queue_size)
+    threads = [threading.Thread(target=_feed, args=(source, in_q), daemon=True)]
+
+    for stage in stages:
+        out_q = stage.queue = queue.Queue(maxsize=stage.queue_size)
+        state = {"lock": threading.Lock(), "running": stage.workers}
+        for _ in range(stage.workers):
+            threads.append(threading.Thread(target=_run_stage, args=(stage, in_q, out_q, state), daemon=True))
+        in_q = out_q
+
+    for thread in threads:
+        thread.start()
+
+    while True:
+        item = in_q.get()
+        if item is _DONE:
+            break
+        yield item
+
+    for thread in threads:
+        thread.join()
+
+
+# PDF ingestion built on run_pipeline: extract -> chunk -> batch -> embed -> upsert
+BOILERPLATE_SAMPLE_PAGES = 40
+
+
+def iter_document_pages(pdf_path, strip_boilerplate=True, extractor=None, page_texts=None):
+    """
+    Yields (pdf_path, page_number, text, {"extractor": name}) for one document,
+    using the named extractor, or else the fastest extraction backend that
+    passes the quality check. Errors are raised to the caller.
+
+    With strip_boilerplate, running headers/footers are first learned from a
+    sample of the document's pages and then removed from every page.
+
+    page_texts, [(page_number, text)] for every page as the named extractor
+    returned them (from a page cache or a process pool), are used instead of
+    reading the PDF again.
+    """
+    extractor = get_extractor(extractor) if extractor else select_extractor(pdf_path)
+    if page_texts is None:
+        read_pages = lambda page_numbers=None: extractor.extract_pages(pdf_path, page_numbers)
+    else:
+        extracted = dict(page_texts)
+        read_pages = lambda page_numbers=None: [(page_num, extracted.get(page_num, "")) for page_num in
+                                                (sorted(extracted) if page_numbers is None else page_numbers)]
+    boilerplate = None
+    if strip_boilerplate:
+        page_count = extractor.page_count(pdf_path) if page_texts is None else len(extracted)
+        sample = sample_page_numbers(page_count, BOILERPLATE_SAMPLE_PAGES)
+        boilerplate = BoilerplateFilter().learn(text for _, text in read_pages(sample))
+    for page_num, text in read_pages():
+        if text and boilerplate is not None:
+            text = boilerplate.clean(text)
+        if text:
+            yield pdf_path, page_num, text, {"extractor": extractor.name}
+    if boilerplate is not None:
+        boilerplate.print_report(pdf_path)
+
+
+def iter_pdf_pages(pdf_paths, strip_boilerplate=True, throttle=None, peak_memory=None):
+    """
+    iter_document_pages over several PDFs; a document that fails to read is reported and skipped.
+
+    Args:
+        throttle (MemoryThrottle): If given, waited on before each page is handed downstream.
+        peak_memory (dict): If given, filled with pdf_path -> peak RSS in MB while reading it.
+    """
+    for pdf_path in pdf_paths:
+        peak = current_rss_mb()
+        try:
+            for page in iter_document_pages(pdf_path, strip_boilerplate):
+                peak = max(peak, current_rss_mb())
+                if throttle is not None:
+                    throttle.wait()
+                yield page
+        except Exception as e:
+            print(f"Error reading {pdf_path}: {str(e)}")
+        if peak_memory is not None:
+            peak_memory[pdf_path] = peak
+            print(f"{pdf_path}: peak RSS {peak:.0f} MB")
+
+
+def page_fingerprint(text):
+    """Hash of a page's extracted text with whitespace normalised."""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+class CrossPageChunker:
+    """
+    Stateful chunk stage that chunks each document across page breaks.
+
+    Pages must arrive in order, so it runs with a single worker. Chunks carry
+    page_start/page_end; "page" is page_start so existing citations still work.
+    page_hashes holds the page_fingerprint of every page the chunk covers, so
+    incremental.reingest_changed_pages can tell which pages changed since any
+    ingest, full or incremental.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+        self.span_chunker = PageSpanChunker(make_text_splitter(chunk_size, chunk_overlap))
+        self.source = None
+        self.extra = {}
+        self.page_hashes = {}
+
+    def _to_items(self, chunks):
+        items = []
+        for text, page_start, page_end in chunks:
+            metadata = {"source": self.source, "page": page_start, "page_start": page_start, "page_end": page_end}
+            metadata["page_hashes"] = json.dumps({page: self.page_hashes[page] for page in range(page_start, page_end + 1)
+                                                  if page in self.page_hashes})
+            metadata.update(self.extra)
+            items.append({"id": make_chunk_id(self.source, page_start, text), "text": text, "metadata": metadata})
+        return items
+
+    def __call__(self, page):
+        pdf_path, page_num, text, *extra = page
+        items = []
+        if source_name(pdf_path) != self.source:
+            items = self.flush()
+            self.source = source_name(pdf_path)
+            self.page_hashes = {}
+        self.extra = extra[0] if extra else {}
+        self.page_hashes[page_num] = page_fingerprint(text)
+        return items + self._to_items(self.span_chunker.add_page(page_num, text))
+
+    def flush(self):
+        return self._to_items(self.span_chunker.flush()) if self.source is not None else []
+
+
+def iter_document_chunks(pages, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    Yields the chunk items ({"id", "text", "metadata"}) of one document's
+    pages, as iter_document_pages yields them, in document order.
+
+    iter_document_pages (extractor choice, boilerplate stripping) followed by
+    a CrossPageChunker is the chunking of every ingestion path, here or in
+    ingest_pdfs_streaming, so one PDF gets the same chunks and IDs whichever
+    path stores it.
+    """
+    chunker = CrossPageChunker(chunk_size, chunk_overlap)
+    for page in pages:
+        yield from chunker(page)
+    yield from chunker.flush()
+
+
+def chunk_document_pages(pages, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """iter_document_chunks as a list; the same text twice on one page maps to one ID, the first is kept."""
+    return list({item["id"]: item for item in iter_document_chunks(pages, chunk_size, chunk_overlap)}.values())
+
+
+def chunk_document(pdf_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, extractor=None, page_texts=None):
+    """Chunk items of one PDF; extractor and page_texts are passed to iter_document_pages."""
+    pages = iter_document_pages(pdf_path, extractor=extractor, page_texts=page_texts)
+    return chunk_document_pages(pages, chunk_size, chunk_overlap)
+
+
+def read_and_chunk_document(pdf_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, extractor=None,
+                            page_texts=None):
+    """chunk_document as langchain Documents, for the apps that store Document lists."""
+    return [Document(page_content=item["text"], metadata=item["metadata"])
+            for item in chunk_document(pdf_path, chunk_size, chunk_overlap, extractor, page_texts)]
+
+
+def make_record_ids_stage(chunk_ids):
+    """Pass-through stage that records the ID of every chunk produced in chunk_ids[source]."""
+    def record_ids(item):
+        chunk_ids.setdefault(item["metadata"]["source"], set()).add(item["id"])
+        return [item]
+
+    return Stage("record_ids", record_ids, workers=1, queue_size=64)
+
+
+def make_skip_existing_stage(collection):
+    """Drops chunks whose content ID is already stored, so they cost no embedding call."""
+    def skip_existing(batch):
+        new_batch = [batch[i] for i in new_chunk_indexes(collection, [item["id"] for item in batch])]
+        return [new_batch] if new_batch else []
+
+    return Stage("skip_existing", skip_existing, workers=1, queue_size=4, item_size=len)
+
+
+def make_embed_stage(embedding_function, workers=4):
+    # .embed is the background (ingestion) lane of an EmbeddingBackend; plain callables work too
+    embed = getattr(embedding_function, "embed", embedding_function)
+
+    def embed_batch(batch):
+        embeddings = embed([item["text"] for item in batch])
+        return [(batch, embeddings)]
+
+    return Stage("embed", embed_batch, workers=workers, queue_size=workers * 2, item_size=len)
+
+
+def make_upsert_stage(collection):
+    def upsert_batch(embedded):
+        batch, embeddings = embedded
+        collection.upsert(
+            ids=[item["id"] for item in batch],
+            documents=[item["text"] for item in batch],
+            metadatas=[item["metadata"] for item in batch],
+            embeddings=embeddings,
+        )
+        return [len(batch)]
+
+    # Chroma writes are serialised anyway, so one writer avoids lock contention
+    return Stage("upsert", upsert_batch, workers=1, queue_size=4, item_size=lambda embedded: len(embedded[0]))
+
+
+def ingest_pdfs_streaming(pdf_paths, embedding_function, collection, chunk_size=CHUNK_SIZE,
+                          chunk_overlap=CHUNK_OVERLAP, batch_size=16, embed_workers=4, pages=None,
+                          rss_limit_mb=None, dedup=False, chunk_ids=None):
+    """
+    Extracts, chunks, embeds and upserts pdf_paths as one overlapping stream.
+
+    Args:
+        pdf_paths (list): PDFs to ingest.
+        embedding_function: Callable mapping a list of texts to embeddings.
+        collection: ChromaDB collection to upsert into.
+        chunk_size (int): Chunk budget in characters (see make_text_splitter).
+        chunk_overlap (int): Overlap between neighbouring chunks, in characters.
+        batch_size (int): Chunks per embedding call / upsert.
+        embed_workers (int): Concurrent embedding batches in flight.
+        pages: Optional page iterator to use instead of iter_pdf_pages(pdf_paths).
+        rss_limit_mb (int): If set, extraction pauses while RSS is above this
+            ceiling and chunks are still queued downstream, and peak RSS per
+            document is reported.
+        dedup (bool): Collapse near-duplicate chunks of the same source before
+            they are embedded (opt-in).
+        chunk_ids (dict): If given, filled with {source: set of chunk IDs}
+            produced in this run (stored or already present), so callers can
+            check what was written and delete what is stale.
+
+    Returns:
+        dict: Number of chunks stored, chunks lost to failed embed/upsert
+            batches, elapsed seconds, per-stage error counts, peak RSS in MB
+            per document (bounded mode only) and dedup savings.
+    """
+    peak_memory = {}
+    stages = []
+    if pages is None:
+        if rss_limit_mb is not None:
+            # Downstream queue depth decides whether waiting can still free memory
+            throttle = MemoryThrottle(rss_limit_mb, pending=lambda: sum(
+                stage.queue.qsize() for stage in stages if stage.queue is not None))
+            pages = iter_pdf_pages(pdf_paths, throttle=throttle, peak_memory=peak_memory)
+        else:
+            pages = iter_pdf_pages(pdf_paths)
+
+    deduplicator = ChunkDeduplicator() if dedup else None
+    stages.append(Stage("chunk", CrossPageChunker(chunk_size, chunk_overlap), workers=1, queue_size=64))
+    if deduplicator is not None:
+        # The LSH index is not thread-safe for add-and-merge, so one worker
+        stages.append(Stage("dedup", deduplicator, workers=1, queue_size=64))
+    if chunk_ids is not None:
+        stages.append(make_record_ids_stage(chunk_ids))
+    stages += [
+        Stage("batch", Batcher(batch_size), workers=1, queue_size=4),
+        make_skip_existing_stage(collection),
+        make_embed_stage(embedding_function, embed_workers),
+        make_upsert_stage(collection),
+    ]
+    start = time.time()
+    stored = sum(run_pipeline(pages, stages))
+
+    dedup_stats = {}
+    if deduplicator is not None:
+        # Duplicates may arrive after their kept copy was written; refresh its source list
+        merged = deduplicator.merged_chunks()
+        if merged:
+            collection.update(ids=[chunk["id"] for chunk in merged], metadatas=[chunk["metadata"] for chunk in merged])
+        dedup_stats = deduplicator.stats()
+        print(f"Near-duplicates collapsed: {dedup_stats['embedding_calls_saved']} embedding calls saved")
+    elapsed = time.time() - start
+    failed = sum(stage.failed_items for stage in stages if stage.name in ("skip_existing", "embed", "upsert"))
+    print(f"✅ Streamed {stored} chunks into ChromaDB in {elapsed:.1f}s")
+    if failed:
+        print(f"⚠️ {failed} chunks were not stored because their batch failed (see errors above)")
+    return {
+        "chunks": stored,
+        "failed_chunks": failed,
+        "seconds": elapsed,
+        "errors": {stage.name: stage.errors for stage in stages},
+        "peak_rss_mb": peak_memory,
+        "dedup": dedup_stats,
+    }
@@ -3,89 +3,78 @@ import json
 import base64
 import boto3
 import streamlit as st
-import pdfplumber
 import chromadb
 from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from chunker import CHUNK_OVERLAP, CHUNK_SIZE
+from pipeline import read_and_chunk_document
+from parallel_extract import read_and_chunk_pdf_parallel
+from numpy_index import open_vector_store
+from bulk_writer import BulkWriter
+from chunk_ids import make_chunk_id, migrate_legacy_sources, new_chunk_indexes, source_name
+from embeddings import shared_titan_embedding
+from rate_limiter import INTERACTIVE, rate_limited
+from singleflight import coalescing_metrics, singleflight
+from watcher import watcher_is_running
 
 # AWS Bedrock client
 brt = boto3.client(service_name="bedrock-runtime", region_name="us-east-1")
 PDF_DIR = "./pdf_dir"
+CHROMA_PATH = "./chromadb"  # the watcher and the UI must index and query the same store
 
 LOGO_PATH = "./logo.png"
 BANNER_PATH = "./chatbot.png"
 
-# Function: Read and Chunk PDF using pdfplumber
-def read_and_chunk_pdf(pdf_path, chunk_size=800, chunk_overlap=25):
+# Function: Read and Chunk PDF with the selected extraction backend
+def read_and_chunk_pdf(pdf_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, parallel=False):
     """
-    Reads a PDF and extracts text chunks using pdfplumber.
+    Reads a PDF with the fastest extraction backend that passes the quality
+    check (see extractors.py), strips running headers/footers and chunks it
+    across page breaks; each chunk records the pages it spans ("page" stays
+    the first one).
+
+    With parallel=True the pages are fanned out across a process pool.
     """
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    all_chunks = []
+    if parallel:
+        return read_and_chunk_pdf_parallel(pdf_path, chunk_size, chunk_overlap)
 
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page_num, page in enumerate(pdf.pages):
-                extracted_text = page.extract_text()
-
-                if extracted_text:
-                    split_docs = text_splitter.create_documents(
-                        texts=[extracted_text],
-                        metadatas=[{"page": page_num + 1}]
-                    )
-                    all_chunks.extend(split_docs)
-
+        return read_and_chunk_document(pdf_path, chunk_size, chunk_overlap)
     except Exception as e:
         print(f"Error reading {pdf_path}: {str(e)}")
-
-    return all_chunks
-
-
-# Step 2: Embedding Function using AWS Bedrock
-class TitanEmbeddingFunction:
-    def __init__(self, model_id, region="us-east-1"):
-        self.model_id = model_id
-        self.bedrock_runtime = boto3.client("bedrock-runtime", region_name=region)
-
-    def __call__(self, input: Documents) -> Embeddings:
-        embeddings = []
-        for text in input:
-            response = brt.invoke_model(
-                modelId=self.model_id,
-                contentType="application/json",
-                accept="application/json",
-                body=json.dumps({"inputText": text})
-            )
-            embedding = json.loads(response["body"].read())["embedding"]
-            embeddings.append(embedding)
-        return embeddings
+        return []
 
 
 # Step 3: Store Embeddings in ChromaDB
 def store_embeddings_in_chromadb(pdf_dir, embedding_function):
-    client = chromadb.PersistentClient("/path/to/chromadb")
-    collection = client.get_or_create_collection(name="my_collection", embedding_function=embedding_function)
+    # VECTOR_STORE=numpy swaps ChromaDB for the memory-mapped exact-search index
+    collection = open_vector_store(embedding_function, chroma_path=CHROMA_PATH)
+    migrate_legacy_sources(collection, pdf_dir)
 
+    # One writer for the whole directory: small PDFs share batches instead of one write per chunk
+    writer = BulkWriter(collection, embedding_function)
     for pdf_file in os.listdir(pdf_dir):
         if pdf_file.endswith(".pdf"):
             pdf_path = os.path.join(pdf_dir, pdf_file)
             print(f"Processing PDF: {pdf_file}")
             try:
                 chunks = read_and_chunk_pdf(pdf_path)
-                for chunk in chunks:
-                    chunk_id = str(hash(chunk.page_content))
-                    collection.add(
-                        documents=[chunk.page_content],
-                        metadatas={"id": chunk_id, "source": pdf_file, **chunk.metadata},
-                        ids=[chunk_id]
-                    )
+                chunk_ids = [make_chunk_id(pdf_path, chunk.metadata.get("page"), chunk.page_content) for chunk in chunks]
+                new_indexes = new_chunk_indexes(collection, chunk_ids)
+                print(f"Skipping {len(chunks) - len(new_indexes)} chunks that are already embedded")
+                for idx in new_indexes:
+                    chunk, chunk_id = chunks[idx], chunk_ids[idx]
+                    writer.add(chunk_id, chunk.page_content, {"id": chunk_id, **chunk.metadata, "source": source_name(pdf_path)})
             except Exception as e:
                 print(f"Error processing PDF {pdf_file}: {str(e)}")
 
+    writer.flush()
+    writer.report()
     return collection
 
 
 # Step 4: Generate Answer Using AWS Bedrock with Enhanced Prompt
+@singleflight("bedrock_answer")
+@rate_limited(INTERACTIVE)
 def generate_answer_with_bedrock(prompt, model_id, region="us-east-1"):
     client = boto3.client("bedrock-runtime", region_name=region)
     try:
@@ -135,7 +124,7 @@ def generate_answer_with_bedrock(prompt, model_id, region="us-east-1"):
 
 # Step 5: RAG - Query ChromaDB and Generate Response
 def query_chromadb_and_generate_response(user_query, embedding_function, collection, model_id, region="us-east-1"):
-    query_embedding = embedding_function([user_query])[0]
+    query_embedding = embedding_function.embed_query(user_query)
     results = collection.query(query_embedding, n_results=5)
 
     if not results or "documents" not in results or not results["documents"]:
@@ -155,9 +144,12 @@ st.set_page_config(page_title="Advanced RAG Chatbot", page_icon="🤖", layout="
 
 if "collection" not in st.session_state:
     with st.spinner("Initializing ChromaDB..."):
-        embedding_function = TitanEmbeddingFunction(model_id="amazon.titan-embed-text-v2:0")
-        client = chromadb.PersistentClient(path="./chromadb")
-        collection = store_embeddings_in_chromadb(PDF_DIR, embedding_function)
+        embedding_function = shared_titan_embedding("amazon.titan-embed-text-v2:0")
+        if watcher_is_running():
+            # The watcher daemon (watcher.py) keeps pdf_dir indexed, no need to rescan it here
+            collection = open_vector_store(embedding_function, chroma_path=CHROMA_PATH)
+        else:
+            collection = store_embeddings_in_chromadb(PDF_DIR, embedding_function)
         st.session_state.collection = collection
         st.success("Embeddings generated and stored!")
 else:
@@ -167,6 +159,9 @@ if st.button("Clear Cache"):
     st.session_state.clear()
     st.success("Cache cleared!")
 
+with st.sidebar.expander("Bedrock request coalescing"):
+    st.json(coalescing_metrics())
+
 # Chatbot UI Layout
 col1, col2, col3 = st.columns([1, 2, 1])
 
@@ -187,7 +182,7 @@ with col2:
             model_id = "anthropic.claude-3-5-sonnet-20240620-v1:0"
             response = query_chromadb_and_generate_response(
                 user_query,
-                TitanEmbeddingFunction(model_id="amazon.titan-embed-text-v2:0"),
+                shared_titan_embedding("amazon.titan-embed-text-v2:0"),
                 st.session_state.collection,
                 model_id,
             )
@@ -0,0 +1,117 @@
+import fcntl
+import functools
+import os
+import struct
+import threading
+import time
+
+RATE_LIMIT_PATH = "./bedrock_rate.state"
+BEDROCK_RPS = float(os.environ.get("BEDROCK_RPS", "20"))  # account-level Bedrock requests per second
+BEDROCK_BURST = float(os.environ.get("BEDROCK_BURST", "40"))
+RESERVE_FRACTION = 0.25  # share of the bucket background jobs may never take
+DEMAND_WINDOW = 0.5  # seconds a waiting interactive request keeps background lanes paused
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+_STATE = struct.Struct("ddd")  # tokens, last refill time, interactive demand deadline
+
+
+class HostRateLimiter:
+    """
+    Token bucket shared by every process on the host through a small state
+    file guarded by fcntl.flock.
+
+    Two priority lanes draw from the one bucket. Interactive requests (query
+    embeddings, answer generation) may take any token. Background requests
+    (bulk embedding) leave RESERVE_FRACTION of the bucket untouched and pause
+    entirely while an interactive request is waiting, so a bulk ingest cannot
+    throttle the chat UI into errors.
+    """
+
+    def __init__(self, path=RATE_LIMIT_PATH, rate=BEDROCK_RPS, burst=BEDROCK_BURST, reserve_fraction=RESERVE_FRACTION):
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+        self.reserve = burst * reserve_fraction
+        self.stats = {INTERACTIVE: 0, BACKGROUND: 0, "waits": 0}
+        self._stats_lock = threading.Lock()
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            if os.fstat(fd).st_size < _STATE.size:
+                os.pwrite(fd, _STATE.pack(burst, time.time(), 0.0), 0)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _try_take(self, lane, tokens):
+        """Returns 0 when the tokens were taken, otherwise the seconds to wait before retrying."""
+        fd = os.open(self.path, os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            available, last, demand_until = _STATE.unpack(os.pread(fd, _STATE.size, 0))
+            now = time.time()
+            available = min(self.burst, available + (now - last) * self.rate)
+
+            if lane == INTERACTIVE:
+                needed = tokens
+            elif demand_until > now:
+                needed = None  # an interactive request is waiting: background yields
+            else:
+                needed = tokens + self.reserve
+
+            if needed is not None and available >= needed:
+                available -= tokens
+                wait = 0.0
+            else:
+                if lane == INTERACTIVE:
+                    demand_until = now + DEMAND_WINDOW
+                    wait = (needed - available) / self.rate
+                elif needed is None:
+                    wait = demand_until - now
+                else:
+                    wait = (needed - available) / self.rate
+            os.pwrite(fd, _STATE.pack(available, now, demand_until), 0)
+            return wait
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def acquire(self, lane=BACKGROUND, tokens=1):
+        """Blocks until tokens are available to lane."""
+        waited = False
+        while True:
+            wait = self._try_take(lane, tokens)
+            if wait <= 0:
+                break
+            waited = True
+            # Short sleeps: other processes may refill or release demand before the estimate
+            time.sleep(min(max(wait, 0.005), 0.25))
+        with self._stats_lock:
+            self.stats[lane] += tokens
+            self.stats["waits"] += waited
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def bedrock_limiter():
+    """The process-wide HostRateLimiter, created on first use."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = HostRateLimiter()
+        return _limiter
+
+
+def rate_limited(lane):
+    """Decorator: every call of the function first takes one Bedrock token from lane."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bedrock_limiter().acquire(lane)
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
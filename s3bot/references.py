@@ -4,7 +4,7 @@ from sklearn.metrics.pairwise import cosine_similarity
 
 def query_chromadb_and_generate_response(user_query, embedding_function, collection, model_id, region="us-east-1"):
     # Generate query embedding
-    query_embedding = embedding_function([user_query])
+    query_embedding = [embedding_function.embed_query(user_query)]
     
     # Query ChromaDB for relevant documents
     results = collection.query(query_embedding, n_results=10, include=["documents", "metadatas", "embeddings"])  # Increase recall
@@ -0,0 +1,101 @@
+import functools
+import hashlib
+import json
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight calls: while a call for key is running,
+    further calls with the same key wait for it and get its result (or its
+    exception) instead of calling upstream again.
+
+    Nothing is cached once the call finishes; a later identical request runs
+    again. Streamlit serves every session from a thread of one process, so
+    concurrent users asking the same question share one Bedrock call.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "executed": 0, "coalesced": 0}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            self.stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats["executed"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            # Also KeyboardInterrupt or a Streamlit rerun/stop: followers must not take a missing result for None
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self.stats, in_flight=len(self._calls))
+        stats["coalesced_ratio"] = stats["coalesced"] / stats["calls"] if stats["calls"] else 0.0
+        return stats
+
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+
+def get_group(name):
+    """The process-wide SingleFlight for name, created on first use."""
+    with _groups_lock:
+        if name not in _groups:
+            _groups[name] = SingleFlight(name)
+        return _groups[name]
+
+
+def request_key(*parts):
+    """Stable digest of JSON-serialisable call arguments."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def singleflight(name):
+    """Decorator: identical concurrent calls (same arguments) of the function share one execution."""
+    def decorator(fn):
+        group = get_group(name)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return group.do(request_key(args, kwargs), fn, *args, **kwargs)
+
+        return wrapper
+    return decorator
+
+
+def coalescing_metrics():
+    """{group name: metrics} for every SingleFlight group in this process."""
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {group.name: group.metrics() for group in groups}
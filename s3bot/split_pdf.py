@@ -1,13 +1,16 @@
 import os
+import json
 from PyPDF2 import PdfReader, PdfWriter
 
-def split_pdf(input_pdf, output_folder, pages_per_split=10):
+def split_pdf(input_pdf, output_folder, pages_per_split=10, virtual=False):
     """
     Splits a large PDF into multiple smaller PDFs.
     
     :param input_pdf: Path to the input PDF file.
     :param output_folder: Folder to save the split PDFs.
     :param pages_per_split: Number of pages per split file.
+    :param virtual: Only write manifest.json with the page ranges (same format
+        as pdfsplit.split_pdf_by_size) instead of copying every page.
     """
     # Ensure output folder exists
     os.makedirs(output_folder, exist_ok=True)
@@ -16,6 +19,17 @@ def split_pdf(input_pdf, output_folder, pages_per_split=10):
     pdf_reader = PdfReader(input_pdf)
     total_pages = len(pdf_reader.pages)
 
+    if virtual:
+        parts = [
+            {"name": f"split_{i+1}-{min(i + pages_per_split, total_pages)}.pdf",
+             "first_page": i + 1, "last_page": min(i + pages_per_split, total_pages)}
+            for i in range(0, total_pages, pages_per_split)
+        ]
+        with open(os.path.join(output_folder, "manifest.json"), "w") as f:
+            json.dump({"source": os.path.abspath(input_pdf), "virtual": True, "parts": parts}, f, indent=2)
+        print(f"Recorded {len(parts)} virtual parts in {output_folder}/manifest.json")
+        return
+
     # Split logic
     for i in range(0, total_pages, pages_per_split):
         pdf_writer = PdfWriter()
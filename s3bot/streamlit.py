@@ -3,63 +3,40 @@ import json
 import boto3
 import streamlit as st
 from PyPDF2 import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from chunker import CHUNK_OVERLAP, CHUNK_SIZE
 from chromadb import PersistentClient
+from parallel_extract import read_and_chunk_pdf_parallel
+from pipeline import read_and_chunk_document
+from bulk_writer import BulkWriter
+from chunk_ids import make_chunk_id, new_chunk_indexes
+from embeddings import shared_titan_embedding
+from rate_limiter import INTERACTIVE, rate_limited
+from singleflight import singleflight
 
 # Step 1: Read and Chunk PDF
-def read_and_chunk_pdf(pdf_path, chunk_size=800, chunk_overlap=25):
-    pdf_reader = PdfReader(pdf_path)
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-
-    chunks = []
-    for page_num, page in enumerate(pdf_reader.pages):
-        text = page.extract_text()
-        if text:
-            split_docs = text_splitter.create_documents(
-                texts=[text],
-                metadatas=[{"page": page_num + 1}]
-            )
-            chunks.extend(split_docs)
-    return chunks
-
-# Step 2: Embedding Function using AWS Bedrock
-class TitanEmbeddingFunction:
-    def __init__(self, model_id, region="us-east-1"):
-        self.model_id = model_id
-        self.bedrock_runtime = boto3.client("bedrock-runtime", region_name=region)
-
-    def __call__(self, input):
-        embeddings = []
-        for text in input:
-            response = self.bedrock_runtime.invoke_model(
-                modelId=self.model_id,
-                contentType="application/json",
-                accept="application/json",
-                body=json.dumps({"inputText": text})
-            )
-            embedding = json.loads(response["body"].read())["embedding"]
-            embeddings.append(embedding)
-        return embeddings
+def read_and_chunk_pdf(pdf_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, parallel=False):
+    if parallel:
+        return read_and_chunk_pdf_parallel(pdf_path, chunk_size, chunk_overlap)
+    return read_and_chunk_document(pdf_path, chunk_size, chunk_overlap)
 
 # Step 3: Store Embeddings in ChromaDB
 def store_embeddings_in_chromadb(chunks, embedding_function):
     client = PersistentClient(path="./chromadb")
     collection = client.get_or_create_collection(name="my_collection", embedding_function=embedding_function)
 
-    existing_data = collection.get(include=["metadatas"])
-    existing_ids = {metadata.get("id") for metadata in existing_data["metadatas"] if "id" in metadata}
+    chunk_ids = [
+        make_chunk_id(chunk.metadata.get("source"), chunk.metadata.get("page"), chunk.page_content)
+        for chunk in chunks
+    ]
 
-    for idx, chunk in enumerate(chunks):
-        chunk_id = str(idx)
-        if chunk_id in existing_ids:
-            continue
-        collection.add(
-            documents=[chunk.page_content],
-            metadatas=[{"id": chunk_id, **chunk.metadata}],
-            ids=[chunk_id]
-        )
+    with BulkWriter(collection, embedding_function) as writer:
+        for idx in new_chunk_indexes(collection, chunk_ids):
+            chunk, chunk_id = chunks[idx], chunk_ids[idx]
+            writer.add(chunk_id, chunk.page_content, {"id": chunk_id, **chunk.metadata})
 
 # Step 4: Generate Answer Using AWS Bedrock
+@singleflight("bedrock_answer")
+@rate_limited(INTERACTIVE)
 def generate_answer_with_bedrock(prompt, model_id, region="us-east-1"):
     client = boto3.client("bedrock-runtime", region_name=region)
     try:
@@ -87,7 +64,7 @@ def generate_answer_with_bedrock(prompt, model_id, region="us-east-1"):
 
 # Step 5: Query ChromaDB and Generate Response
 def query_chromadb_and_generate_response(user_query, embedding_function, collection, model_id, region="us-east-1"):
-    query_embedding = embedding_function([user_query])[0]
+    query_embedding = embedding_function.embed_query(user_query)
     results = collection.query(query_embedding, n_results=5)
 
     if not results or "documents" not in results or not results["documents"]:
@@ -113,7 +90,7 @@ if os.path.exists(pdf_path):
     # Initialize ChromaDB and Store Embeddings
     model_id = "anthropic.claude-3-5-sonnet-20240620-v1:0"
     region = "us-east-1"
-    embedding_function = TitanEmbeddingFunction(model_id=model_id, region=region)
+    embedding_function = shared_titan_embedding(model_id, region)
 
     client = PersistentClient(path="./chromadb")
     collection = client.get_or_create_collection(name="my_collection", embedding_function=embedding_function)
@@ -1,6 +1,8 @@
 import os
 import requests
 
+from attachments import ATTACHMENT_TYPES, ingest_attachments
+
 # Constants for authentication and file storage
 IMAGE_DIR = "attachments"  # Ensure this directory exists
 USERNAME = "your_username"
@@ -39,8 +41,11 @@ def get_multiple_jira_issues(issue_keys):
         if "attachment" in issue["fields"]:
             for attachment in issue["fields"]["attachment"]:
                 filename = attachment["filename"]
-                if filename.endswith((".png", ".jpg", ".jpeg", ".pdf", ".docx")):  # Adjust as needed
-                    file_path = os.path.join(IMAGE_DIR, filename)
+                if filename.endswith((".png", ".jpg", ".jpeg") + ATTACHMENT_TYPES):  # Adjust as needed
+                    # One directory per issue: same-named attachments of different issues must not collide
+                    issue_dir = os.path.join(IMAGE_DIR, issue["key"])
+                    os.makedirs(issue_dir, exist_ok=True)
+                    file_path = os.path.join(issue_dir, filename)
                     response = requests.get(attachment["content"], auth=(USERNAME, API_TOKEN), verify=False)
 
                     if response.status_code == 200:
@@ -53,6 +58,20 @@ def get_multiple_jira_issues(issue_keys):
     return issue_list
 
 
+def index_issue_attachments(issues_data, embedding_function, collection):
+    """
+    Extracts the downloaded pdf/docx/xlsx/pptx attachments in a process pool and
+    indexes them; every chunk carries the jira_key of the issue it came from.
+    """
+    attachments = [
+        (file_path, issue["Key"])
+        for issue in issues_data
+        for file_path in issue["Attachments"]
+        if file_path.lower().endswith(ATTACHMENT_TYPES)
+    ]
+    return ingest_attachments(attachments, embedding_function, collection)
+
+
 issue_keys = [""]  # Your list of issue keys
 issues_data = get_multiple_jira_issues(issue_keys)
 
@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import threading
+import time
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from chunk_ids import migrate_legacy_sources, source_name
+from chunker import CHUNK_OVERLAP, CHUNK_SIZE
+from embeddings import shared_titan_embedding
+from incremental import reingest_changed_pages
+from numpy_index import open_vector_store
+
+DEBOUNCE_SECONDS = 2.0  # quiet time after the last event before a file is ingested
+MAX_RETRIES = 3  # a PDF that fails to parse is retried, it may still have been half-written
+HEARTBEAT_PATH = "./pdf_watcher.heartbeat"
+HEARTBEAT_MAX_AGE = 30  # seconds; an older heartbeat means the watcher is not running
+
+
+def watcher_is_running(heartbeat_path=HEARTBEAT_PATH, max_age=HEARTBEAT_MAX_AGE):
+    """True when a watcher daemon refreshed its heartbeat recently, so the UI can skip its own pdf_dir scan."""
+    try:
+        return time.time() - os.path.getmtime(heartbeat_path) < max_age
+    except OSError:
+        return False
+
+
+def _file_state(path):
+    try:
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+    except OSError:
+        return None
+
+
+class PdfDirHandler(FileSystemEventHandler):
+    """Turns filesystem events for *.pdf files into entries of the watcher's pending table."""
+
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.schedule(event.src_path, "upsert")
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.schedule(event.src_path, "upsert")
+
+    def on_closed(self, event):
+        # inotify IN_CLOSE_WRITE: the writer is done, no need to wait out the full debounce
+        if not event.is_directory:
+            self.watcher.schedule(event.src_path, "upsert", delay=0.2)
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self.watcher.schedule(event.src_path, "delete")
+
+    def on_moved(self, event):
+        # Uploaders often write "x.pdf.part" and rename it, so the destination counts as a new file
+        if not event.is_directory:
+            self.watcher.schedule(event.src_path, "delete")
+            self.watcher.schedule(event.dest_path, "upsert")
+
+
+class PdfDirWatcher:
+    """
+    Keeps a ChromaDB collection in sync with a PDF directory.
+
+    Events are debounced per file: a file is only processed once it has been
+    quiet for debounce seconds and its size and mtime did not change since the
+    last event, so half-copied PDFs are not ingested. Created and modified
+    files go through reingest_changed_pages, which only re-embeds chunks that
+    changed; deleted files have their chunks removed. run() applies the
+    changes one file at a time, so writes to the collection never overlap.
+    """
+
+    def __init__(self, pdf_dir, embedding_function, collection, debounce=DEBOUNCE_SECONDS,
+                 heartbeat_path=HEARTBEAT_PATH, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+        self.pdf_dir = pdf_dir
+        self.embedding_function = embedding_function
+        self.collection = collection
+        self.debounce = debounce
+        self.heartbeat_path = heartbeat_path
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.pending = {}  # path -> {"action", "due", "state", "attempts"}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.observer = None
+        self.stats = {"ingested": 0, "deleted": 0, "errors": 0}
+
+    def schedule(self, path, action, delay=None, attempts=0):
+        if not path.endswith(".pdf"):
+            return
+        delay = self.debounce if delay is None else delay
+        with self.lock:
+            self.pending[path] = {
+                "action": action,
+                "due": time.monotonic() + delay,
+                "state": _file_state(path),
+                "attempts": attempts,
+            }
+
+    def initial_sync(self):
+        """Queues every PDF on disk and deletes sources that are indexed but gone, to catch up on missed events."""
+        migrate_legacy_sources(self.collection, self.pdf_dir)
+        on_disk = {os.path.join(self.pdf_dir, f) for f in os.listdir(self.pdf_dir) if f.endswith(".pdf")}
+        indexed = {metadata.get("source") for metadata in self.collection.get(include=["metadatas"])["metadatas"]}
+        for path in sorted(on_disk):
+            self.schedule(path, "upsert", delay=0)
+        # Sources are normalised paths, so anything indexed under pdf_dir that is not on disk is gone
+        prefix = os.path.join(source_name(self.pdf_dir), "")
+        gone = {source for source in indexed if source and source.startswith(prefix)} - {source_name(path) for path in on_disk}
+        for source in sorted(gone):
+            self.schedule(source, "delete", delay=0)
+
+    def _take_ready(self):
+        now = time.monotonic()
+        ready = []
+        with self.lock:
+            for path, entry in list(self.pending.items()):
+                if entry["due"] > now:
+                    continue
+                state = _file_state(path)
+                if entry["action"] == "upsert" and state != entry["state"]:
+                    # Still being written: wait for another quiet period
+                    entry["state"] = state
+                    entry["due"] = now + self.debounce
+                    continue
+                ready.append((path, self.pending.pop(path)))
+        return ready
+
+    def _process(self, path, entry):
+        try:
+            if entry["action"] == "delete":
+                self.collection.delete(where={"source": source_name(path)})
+                self.stats["deleted"] += 1
+                print(f"🗑️ Removed {path} from ChromaDB")
+            elif os.path.exists(path):
+                start = time.time()
+                reingest_changed_pages(path, self.embedding_function, self.collection,
+                                       self.chunk_size, self.chunk_overlap)
+                self.stats["ingested"] += 1
+                print(f"✅ {path} searchable after {time.time() - start:.1f}s")
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Error processing {path}: {str(e)}")
+            if entry["attempts"] + 1 < MAX_RETRIES:
+                self.schedule(path, entry["action"], attempts=entry["attempts"] + 1)
+
+    def _touch_heartbeat(self):
+        with open(self.heartbeat_path, "w") as f:
+            json.dump({"pid": os.getpid(), "pdf_dir": self.pdf_dir, **self.stats}, f)
+
+    def start(self, initial_sync=True):
+        self.observer = Observer()  # inotify backend on Linux
+        self.observer.schedule(PdfDirHandler(self), self.pdf_dir, recursive=False)
+        self.observer.start()
+        if initial_sync:
+            self.initial_sync()
+        print(f"👀 Watching {self.pdf_dir} for PDF changes")
+
+    def run(self, poll_interval=0.5, initial_sync=True):
+        """Starts the observer and processes debounced events until stop() or Ctrl+C."""
+        self.start(initial_sync)
+        last_heartbeat = 0
+        try:
+            while not self.stop_event.is_set():
+                for path, entry in self._take_ready():
+                    self._process(path, entry)
+                if time.monotonic() - last_heartbeat > HEARTBEAT_MAX_AGE / 3:
+                    self._touch_heartbeat()
+                    last_heartbeat = time.monotonic()
+                self.stop_event.wait(poll_interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+            self.observer = None
+        if os.path.exists(self.heartbeat_path):
+            os.remove(self.heartbeat_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch a PDF directory and keep ChromaDB in sync")
+    parser.add_argument("pdf_dir", nargs="?", default="./pdf_dir")
+    parser.add_argument("--chromadb", default="./chromadb")
+    parser.add_argument("--collection", default="my_collection")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE_SECONDS)
+    parser.add_argument("--no-initial-sync", action="store_true")
+    args = parser.parse_args()
+
+    embedding_function = shared_titan_embedding("amazon.titan-embed-text-v2:0")
+    # Honours VECTOR_STORE like the apps, so the watcher keeps whichever store they query in sync
+    collection = open_vector_store(embedding_function, name=args.collection, chroma_path=args.chromadb)
+    PdfDirWatcher(args.pdf_dir, embedding_function, collection, debounce=args.debounce).run(
+        initial_sync=not args.no_initial_sync)